@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pipeline allocation benchmark: fresh outputs per stage vs. BufferPool
+Runs several frames through the pipeline under StageProfiler and counts, per frame, the
+stages that left a large block allocated (tracemalloc bytes still held after the stage,
+i.e. a newly allocated output), together with the frame peak. With the pool every frame
+after the first must allocate no outputs; transient temporaries inside the stages show
+up in the peak only.
+
+usage: python benchmark_alloc.py [-r vga|720p|1080p|8mp] [-n FRAMES] [--min-size BYTES]
+"""
+
+import argparse
+import sys
+import time
+
+from benchmark_isp import RESOLUTIONS, synthetic_bayer
+from model.pipeline import BufferPool, Pipeline, STAGE_ORDER, load_parameters
+from model.profiler import StageProfiler
+
+
+def run_frames(parameters, frames, min_size, pool=None):
+    rows = []
+    for k, rawimg in enumerate(frames):
+        profiler = StageProfiler()
+        pipeline = Pipeline(STAGE_ORDER, parameters, profiler=profiler, pool=pool)
+        start = time.perf_counter()
+        pipeline.execute(rawimg)
+        seconds = time.perf_counter() - start
+        allocating = [r['stage'] for r in profiler.records if r['retained_bytes'] >= min_size]
+        peak = max(r['peak_bytes'] for r in profiler.records)
+        rows.append((k, seconds, allocating, peak))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pipeline allocation benchmark')
+    parser.add_argument('-r', '--resolution', default='vga', choices=list(RESOLUTIONS))
+    parser.add_argument('-n', '--frames', type=int, default=4, help='frames per run')
+    parser.add_argument('--min-size', type=int, default=64 * 1024, help='smallest block counted as large')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='config.csv path')
+    args = parser.parse_args()
+
+    parameters = load_parameters(args.config)
+    raw_w, raw_h = RESOLUTIONS[args.resolution]
+    frames = [synthetic_bayer(raw_w, raw_h, parameters['bayer_pattern'], seed) for seed in range(args.frames)]
+    print(f'{args.resolution} ({raw_w}x{raw_h}), {args.frames} frames, blocks >= {args.min_size} bytes')
+
+    pool = BufferPool()
+    results = {
+        'fresh': run_frames(parameters, frames, args.min_size),
+        'pooled': run_frames(parameters, frames, args.min_size, pool),
+    }
+
+    for name, rows in results.items():
+        print(50 * '-')
+        print(name)
+        for k, seconds, allocating, peak in rows:
+            print(f'frame {k}: {seconds * 1000:8.1f} ms  {len(allocating):3d} large allocations  '
+                  f'stage peak {peak / 1e6:7.2f} MB')
+    print(50 * '-')
+    print(f'pool: {len(pool.buffers)} buffers, {pool.nbytes() / 1e6:.2f} MB, {pool.hits} hits, {pool.misses} misses')
+
+    steady = [allocating for _, _, allocating, _ in results['pooled'][1:] if allocating]
+    if steady:
+        print(f'steady-state frames still allocate outputs in: {steady}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
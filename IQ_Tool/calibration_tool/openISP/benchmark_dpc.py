@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+DPC benchmark: per-pixel loop vs. vectorized engine
+Checks that both engines give identical output and reports the speedup.
+
+The vectorized engine runs the kernel of the selected model.backend backend: it is
+warmed up on a tiny frame first (Numba compiles or loads its cache on the first call)
+and timed as the best of --repeat runs.
+
+usage: python benchmark_dpc.py [--rows N] [--repeat N]
+  --rows N    only run on the first N rows (the loop takes minutes on a full 1080p frame)
+  --repeat N  timed runs of the vectorized engine, the fastest is reported
+"""
+
+import argparse
+import time
+import numpy as np
+
+from model import backend
+from model.dpc import DPC
+
+raw_path = './raw/chart24_1920x1080.RAW'
+raw_w = 1920
+raw_h = 1080
+dpc_thres = 30
+dpc_clip = 1023
+
+
+def run(rawimg, mode, vectorized, repeat=1):
+    'output and fastest of repeat timed runs'
+    best = None
+    for _ in range(repeat):
+        dpc = DPC(rawimg.copy(), dpc_thres, mode, dpc_clip, vectorized=vectorized)
+        start = time.perf_counter()
+        out = dpc.execute()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DPC loop vs. vectorized benchmark')
+    parser.add_argument('--rows', type=int, default=raw_h, help='number of rows to process')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of the vectorized engine')
+    args = parser.parse_args()
+
+    rawimg = np.fromfile(raw_path, dtype='uint16', sep='')
+    rawimg = rawimg.reshape([raw_h, raw_w])[:args.rows, :]
+    print(f'{raw_path}: {rawimg.shape[1]}x{rawimg.shape[0]}, {backend.BACKEND} backend')
+
+    for mode in ['gradient', 'mean']:
+        run(rawimg[:8, :8], mode, True)     # JIT compile / cache load, not timed
+        out_vec, t_vec = run(rawimg, mode, True, args.repeat)
+        out_loop, t_loop = run(rawimg, mode, False)
+        print(50 * '-')
+        print(f'mode        : {mode}')
+        print(f'loop        : {t_loop:.3f} s')
+        print(f'vectorized  : {t_vec:.3f} s ({backend.BACKEND}, best of {args.repeat})')
+        print(f'speedup     : {t_loop / t_vec:.1f}x')
+        print(f'bit exact   : {np.array_equal(out_loop, out_vec)}')
+
+
+if __name__ == '__main__':
+    main()
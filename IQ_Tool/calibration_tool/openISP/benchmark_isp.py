@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+openISP stage benchmark
+Runs every stage of the pipeline on synthetic 10-bit Bayer frames at several resolutions
+and reports throughput in megapixels per second. Each stage is fed the output of the
+previous one, so it sees the dtypes and value ranges of a real run.
+
+usage: python benchmark_isp.py [-r vga,720p,1080p,8mp] [-n REPEAT] [--baseline FILE]
+                               [--save-baseline] [--tolerance 0.2]
+  --save-baseline  write the measured throughput to the baseline file
+  --tolerance      fail (exit code 1) when a stage is slower than the baseline by more
+                   than this fraction. Stages the baseline has no entry for are listed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+from model.bayer import BAYER_PHASES
+from model.pipeline import Pipeline, STAGE_ORDER, load_parameters
+
+RESOLUTIONS = {
+    'vga': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '8mp': (3264, 2448),
+}
+
+
+def synthetic_bayer(raw_w, raw_h, bayer_pattern='rggb', seed=0):
+    'smooth 10-bit scene with per-channel levels, a few edges and sensor-like noise'
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:raw_h, 0:raw_w]
+    scene = 200 + 500 * (x / raw_w) * (y / raw_h)
+    scene += 150 * ((x // 64 + y // 64) % 2)    # checker edges for DPC/EE/FCS
+    levels = {'r': 0.8, 'gr': 1.0, 'gb': 1.0, 'b': 0.6}
+    for channel, (py, px) in BAYER_PHASES[bayer_pattern].items():
+        scene[py::2, px::2] *= levels[channel]
+    scene += rng.normal(0, 8, scene.shape)
+    rawimg = np.clip(scene, 0, 1023).astype(np.uint16)
+    dead = rng.integers(0, rawimg.size, rawimg.size // 10000)
+    rawimg.flat[dead] = 1023    # hot pixels for DPC
+    return rawimg
+
+
+def bench_resolution(raw_w, raw_h, parameters, repeat):
+    'best-of-repeat seconds of each stage, in pipeline order'
+    pipeline = Pipeline(STAGE_ORDER, parameters)
+    frame = {'img': synthetic_bayer(raw_w, raw_h, pipeline.parameters['bayer_pattern'])}
+    seconds = {}
+    for stage in pipeline.stages:
+        pipeline.enter(frame, stage)
+        img = stage.negotiate(frame[stage.plane])
+        best = None
+        for _ in range(repeat):
+            scratch = dict(frame)
+            start = time.perf_counter()
+            out = stage.run(img, pipeline.parameters, scratch)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        frame = scratch
+        frame[stage.plane] = out
+        seconds[stage.name] = best
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='openISP stage benchmark')
+    parser.add_argument('-r', '--resolutions', default=','.join(RESOLUTIONS),
+                        help='comma separated list of ' + '/'.join(RESOLUTIONS))
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='runs per stage, the best one counts')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='config.csv path')
+    parser.add_argument('--baseline', default='./benchmark_baseline.json', help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs. baseline')
+    args = parser.parse_args()
+
+    parameters = load_parameters(args.config)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    unchecked = []
+    for name in args.resolutions.split(','):
+        raw_w, raw_h = RESOLUTIONS[name]
+        megapixels = raw_w * raw_h / 1e6
+        seconds = bench_resolution(raw_w, raw_h, parameters, args.repeat)
+        results[name] = {stage: megapixels / t for stage, t in seconds.items()}
+        print(50 * '-')
+        print(f'{name} ({raw_w}x{raw_h})')
+        for stage, mps in results[name].items():
+            line = f'{stage:<5} {seconds[stage] * 1000:10.2f} ms {mps:10.2f} MP/s'
+            ref = baseline.get(name, {}).get(stage)
+            if ref:
+                line += f'   baseline {ref:10.2f} MP/s ({mps / ref - 1:+.0%})'
+                if mps < ref * (1 - args.tolerance):
+                    line += '   REGRESSION'
+                    regressions.append(f'{name}/{stage}')
+            elif baseline:
+                line += '   no baseline'
+                unchecked.append(f'{name}/{stage}')
+            print(line)
+        total = sum(seconds.values())
+        print(f'total {total * 1000:10.2f} ms {megapixels / total:10.2f} MP/s')
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'baseline written to {args.baseline}')
+    if unchecked:
+        print(f'{len(unchecked)} stage(s) not in {args.baseline}, not checked: ' + ', '.join(unchecked))
+    if regressions:
+        print(f'{len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}: '
+              + ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batch ISP runner
+Runs every RAW of a directory or glob through the openISP pipeline on a process pool.
+Inputs are read through a memory map (MIPI packed formats included), each output is
+saved as <name>.npy next to a manifest.json holding the per-frame and per-stage timings.
+
+usage: python isp_batch.py INPUT [-c CONFIG] [-o OUT_DIR] [-j JOBS] [--width W --height H]
+                           [--format raw10|raw12|raw14|raw16] [--stride BYTES] [--offset BYTES]
+  INPUT        directory (all *.RAW inside) or glob pattern
+  --width/--height  override raw_w/raw_h of the config
+  --format     MIPI packed formats are unpacked from the memory map, no intermediate file
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from model.pipeline import Pipeline, STAGE_ORDER, load_parameters
+from model.backend import BACKENDS, set_backend
+from model.rawio import RAW_FORMATS, read_raw
+
+# set once per worker process by init_worker
+worker_pipeline = None
+worker_layout = None
+
+
+def init_worker(parameters, layout, stripe_rows, backend):
+    global worker_pipeline, worker_layout
+    if backend:
+        set_backend(backend)
+    worker_pipeline = Pipeline(STAGE_ORDER, parameters, stripe_rows)
+    worker_layout = layout
+
+
+def process_frame(raw_path, out_path):
+    start = time.perf_counter()
+    rawimg = read_raw(raw_path, **worker_layout)
+    img = worker_pipeline.execute(rawimg)
+    np.save(out_path, img)
+    return {
+        'input': raw_path,
+        'output': out_path,
+        'pid': os.getpid(),
+        'seconds': time.perf_counter() - start,
+        'stages': dict(worker_pipeline.timings),
+    }
+
+
+def collect_inputs(pattern):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.RAW')
+    return sorted(glob.glob(pattern))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='openISP batch runner')
+    parser.add_argument('input', help='directory of .RAW files or glob pattern')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='config.csv path')
+    parser.add_argument('-o', '--out-dir', default='./out', help='output directory')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--width', type=int, help='RAW width, defaults to raw_w of the config')
+    parser.add_argument('--height', type=int, help='RAW height, defaults to raw_h of the config')
+    parser.add_argument('--format', default='raw16', choices=list(RAW_FORMATS), help='RAW packing')
+    parser.add_argument('--stride', type=int, help='line pitch in bytes, defaults to the packed line size')
+    parser.add_argument('--offset', type=int, default=0, help='header bytes before the first line')
+    parser.add_argument('--bits', type=int, default=10, help='bit depth the pipeline clips at')
+    parser.add_argument('--backend', choices=BACKENDS, help='force a kernel backend, default: fastest installed')
+    parser.add_argument('--stripe-rows', type=int, default=0, help='run each frame in stripes of N rows')
+    args = parser.parse_args()
+    if args.backend:
+        set_backend(args.backend)
+
+    raw_paths = collect_inputs(args.input)
+    if not raw_paths:
+        parser.error(f'no RAW files match {args.input}')
+    parameters = load_parameters(args.config)
+    raw_w = args.width or int(parameters['raw_w'])
+    raw_h = args.height or int(parameters['raw_h'])
+    layout = {'width': raw_w, 'height': raw_h, 'fmt': args.format, 'stride': args.stride,
+              'offset': args.offset, 'out_bits': args.bits}
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    frames = []
+    with ProcessPoolExecutor(args.jobs, initializer=init_worker,
+                             initargs=(parameters, layout, args.stripe_rows, args.backend)) as pool:
+        futures = []
+        for raw_path in raw_paths:
+            name = os.path.splitext(os.path.basename(raw_path))[0]
+            futures.append(pool.submit(process_frame, raw_path, os.path.join(args.out_dir, name + '.npy')))
+        for future in futures:
+            frame = future.result()
+            frames.append(frame)
+            print(f"{frame['input']} -> {frame['output']} ({frame['seconds']:.3f} s)")
+    wall = time.perf_counter() - start
+
+    manifest = {
+        'config': args.config,
+        'raw_w': raw_w,
+        'raw_h': raw_h,
+        'format': args.format,
+        'jobs': args.jobs,
+        'wall_seconds': wall,
+        'frames_per_second': len(frames) / wall,
+        'frames': frames,
+    }
+    manifest_path = os.path.join(args.out_dir, 'manifest.json')
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(50*'-' + f'\n{len(frames)} frames in {wall:.3f} s, manifest: {manifest_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,6 @@ Image Signal Processor with Real-time Parameter Tuning
 
 import sys
 import os
-import csv
 import numpy as np
 from pathlib import Path
 from collections import OrderedDict
@@ -16,227 +15,44 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QSlider, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton,
     QFileDialog, QTabWidget, QScrollArea, QGridLayout, QGroupBox,
-    QMessageBox, QSplitter, QProgressBar, QStatusBar
+    QMessageBox, QSplitter, QProgressBar, QStatusBar, QLineEdit
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt5.QtGui import QImage, QPixmap, QFont
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QPointF, QRectF
+from PyQt5.QtGui import QImage, QPixmap, QFont, QPainter, QColor
 from PyQt5.QtWidgets import QListWidget, QListWidgetItem
 import cv2
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-
-from model.dpc import DPC
-from model.blc import BLC
-from model.aaf import AAF
-from model.awb import WBGC
-from model.cnf import CNF
-from model.cfa import CFA
-from model.gac import GC
-from model.ccm import CCM
-from model.csc import CSC
-from model.bnf import BNF
-from model.eeh import EE
-from model.fcs import FCS
-from model.bcc import BCC
-from model.hsc import HSC
-from model.nlm import NLM
+
+from model.config import ROWS
+from model.csc import yuv_to_rgb
+from model.pipeline import Pipeline, StageCache, as_matrix, load_parameters
+from model.preview import PREVIEW_FACTORS, pyramid
 
 
 class ImageProcessingThread(QThread):
     """Background thread for image processing"""
     progress = pyqtSignal(int)
-    finished = pyqtSignal(np.ndarray)
+    finished = pyqtSignal(np.ndarray, list)     # result, mip levels of its RGB view
     error = pyqtSignal(str)
 
-    def __init__(self, rawimg, parameters, selected_modules):
+    def __init__(self, rawimg, parameters, selected_modules, cache=None, preview=1):
         super().__init__()
         self.rawimg = rawimg
         self.parameters = parameters
         self.selected_modules = selected_modules
+        self.cache = cache
+        self.preview = preview
 
     def run(self):
         try:
-            img = self.rawimg.copy().astype(np.float32)
-            total_steps = len(self.selected_modules)
-            current_step = 0
-
-            # RAW Domain Processing
-            if 'dpc' in self.selected_modules:
-                dpc = DPC(img.astype(np.uint16), int(self.parameters['dpc_thres']),
-                         self.parameters['dpc_mode'], int(self.parameters['dpc_clip']))
-                img = dpc.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'blc' in self.selected_modules:
-                parameter = [int(self.parameters['bl_r']), int(self.parameters['bl_gr']),
-                           int(self.parameters['bl_gb']), int(self.parameters['bl_b']),
-                           int(self.parameters['alpha']), int(self.parameters['beta'])]
-                blc = BLC(img.astype(np.uint16), parameter, self.parameters['bayer_pattern'],
-                         int(self.parameters['blc_clip']))
-                img = blc.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'aaf' in self.selected_modules:
-                aaf = AAF(img.astype(np.uint16))
-                img = aaf.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'awb' in self.selected_modules:
-                parameter = [float(self.parameters['r_gain']), float(self.parameters['gr_gain']),
-                           float(self.parameters['gb_gain']), float(self.parameters['b_gain'])]
-                awb = WBGC(img.astype(np.uint16), parameter, self.parameters['bayer_pattern'],
-                          int(self.parameters['awb_clip']))
-                img = awb.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'cnf' in self.selected_modules:
-                parameter = [float(self.parameters['r_gain']), float(self.parameters['gr_gain']),
-                           float(self.parameters['gb_gain']), float(self.parameters['b_gain'])]
-                cnf = CNF(img.astype(np.uint16), self.parameters['bayer_pattern'], 0, parameter, 1023)
-                img = cnf.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            # RGB Domain Processing
-            if 'cfa' in self.selected_modules:
-                cfa = CFA(img.astype(np.uint16), self.parameters['cfa_mode'],
-                         self.parameters['bayer_pattern'], int(self.parameters['cfa_clip']))
-                img = cfa.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'ccm' in self.selected_modules:
-                ccm_matrix = np.array([
-                    [int(self.parameters['ccm_00']), int(self.parameters['ccm_01']),
-                     int(self.parameters['ccm_02']), int(self.parameters['ccm_03'])],
-                    [int(self.parameters['ccm_10']), int(self.parameters['ccm_11']),
-                     int(self.parameters['ccm_12']), int(self.parameters['ccm_13'])],
-                    [int(self.parameters['ccm_20']), int(self.parameters['ccm_21']),
-                     int(self.parameters['ccm_22']), int(self.parameters['ccm_23'])]
-                ])
-                ccm = CCM(img.astype(np.uint16), ccm_matrix)
-                img = ccm.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'gc' in self.selected_modules:
-                bw = 10
-                gamma = 0.5
-                maxval = pow(2, bw)
-                ind = range(0, maxval)
-                val = [round(pow(float(i) / maxval, gamma) * maxval) for i in ind]
-                lut = dict(zip(ind, val))
-                gc = GC(img.astype(np.uint16), lut, 'rgb')
-                img = gc.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            # Color Space Conversion
-            if 'csc' in self.selected_modules:
-                csc_matrix = np.array([
-                    [1024 * float(self.parameters['csc_00']), 1024 * float(self.parameters['csc_01']),
-                     1024 * float(self.parameters['csc_02']), 1024 * float(self.parameters['csc_03'])],
-                    [1024 * float(self.parameters['csc_10']), 1024 * float(self.parameters['csc_11']),
-                     1024 * float(self.parameters['csc_12']), 1024 * float(self.parameters['csc_13'])],
-                    [1024 * float(self.parameters['csc_20']), 1024 * float(self.parameters['csc_21']),
-                     1024 * float(self.parameters['csc_22']), 1024 * float(self.parameters['csc_23'])]
-                ])
-                csc = CSC(img.astype(np.uint16), csc_matrix)
-                img = csc.execute()
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            # YUV Domain Processing
-            if 'nlm' in self.selected_modules:
-                nlm = NLM(img[:, :, 0].astype(np.uint16), 1, 4,
-                         int(self.parameters['nlm_h']), int(self.parameters['nlm_clip']))
-                img_nlm = nlm.execute()
-                img[:, :, 0] = img_nlm
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'bnf' in self.selected_modules:
-                bnf_dw = np.array([
-                    [int(self.parameters['bnf_dw_00']), int(self.parameters['bnf_dw_01']),
-                     int(self.parameters['bnf_dw_02']), int(self.parameters['bnf_dw_03']),
-                     int(self.parameters['bnf_dw_04'])],
-                    [int(self.parameters['bnf_dw_10']), int(self.parameters['bnf_dw_11']),
-                     int(self.parameters['bnf_dw_12']), int(self.parameters['bnf_dw_13']),
-                     int(self.parameters['bnf_dw_14'])],
-                    [int(self.parameters['bnf_dw_20']), int(self.parameters['bnf_dw_21']),
-                     int(self.parameters['bnf_dw_22']), int(self.parameters['bnf_dw_23']),
-                     int(self.parameters['bnf_dw_24'])],
-                    [int(self.parameters['bnf_dw_30']), int(self.parameters['bnf_dw_31']),
-                     int(self.parameters['bnf_dw_32']), int(self.parameters['bnf_dw_33']),
-                     int(self.parameters['bnf_dw_34'])],
-                    [int(self.parameters['bnf_dw_40']), int(self.parameters['bnf_dw_41']),
-                     int(self.parameters['bnf_dw_42']), int(self.parameters['bnf_dw_43']),
-                     int(self.parameters['bnf_dw_44'])]
-                ])
-                bnf_rw = [int(self.parameters['bnf_rw_0']), int(self.parameters['bnf_rw_1']),
-                         int(self.parameters['bnf_rw_2']), int(self.parameters['bnf_rw_3'])]
-                bnf_rthres = [int(self.parameters['bnf_rthres_0']), int(self.parameters['bnf_rthres_1']),
-                             int(self.parameters['bnf_rthres_2'])]
-                bnf = BNF(img[:, :, 0].astype(np.uint16), bnf_dw, bnf_rw, bnf_rthres,
-                         int(self.parameters['bnf_clip']))
-                img_bnf = bnf.execute()
-                img[:, :, 0] = img_bnf
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'ee' in self.selected_modules:
-                edge_filter = np.array([
-                    [int(self.parameters['edge_filter_00']), int(self.parameters['edge_filter_01']),
-                     int(self.parameters['edge_filter_02']), int(self.parameters['edge_filter_03']),
-                     int(self.parameters['edge_filter_04'])],
-                    [int(self.parameters['edge_filter_10']), int(self.parameters['edge_filter_11']),
-                     int(self.parameters['edge_filter_12']), int(self.parameters['edge_filter_13']),
-                     int(self.parameters['edge_filter_14'])],
-                    [int(self.parameters['edge_filter_20']), int(self.parameters['edge_filter_21']),
-                     int(self.parameters['edge_filter_22']), int(self.parameters['edge_filter_23']),
-                     int(self.parameters['edge_filter_24'])]
-                ])
-                ee_gain = [int(self.parameters['ee_gain_min']), int(self.parameters['ee_gain_max'])]
-                ee_thres = [int(self.parameters['ee_thres_min']), int(self.parameters['ee_thres_max'])]
-                ee_emclip = [int(self.parameters['ee_emclip_min']), int(self.parameters['ee_emclip_max'])]
-                ee = EE(img[:, :, 0].astype(np.uint16), edge_filter, ee_gain, ee_thres, ee_emclip)
-                img_ee, _ = ee.execute()
-                img[:, :, 0] = img_ee
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'fcs' in self.selected_modules:
-                fcs_edge = [int(self.parameters['fcs_edge_min']), int(self.parameters['fcs_edge_max'])]
-                fcs = FCS(img[:, :, 1:3], np.zeros_like(img[:, :, 0]), fcs_edge,
-                         int(self.parameters['fcs_gain']), int(self.parameters['fcs_intercept']),
-                         int(self.parameters['fcs_slope']))
-                img_fcs = fcs.execute()
-                img[:, :, 1:3] = img_fcs
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'hsc' in self.selected_modules:
-                hsc = HSC(img[:, :, 1:3], int(self.parameters['hue']),
-                         int(self.parameters['saturation']), int(self.parameters['hsc_clip']))
-                img_hsc = hsc.execute()
-                img[:, :, 1:3] = img_hsc
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            if 'bcc' in self.selected_modules:
-                contrast = int(self.parameters['contrast']) / pow(2, 5)
-                bcc = BCC(img[:, :, 0].astype(np.uint16), int(self.parameters['brightness']),
-                         contrast, int(self.parameters['bcc_clip']))
-                img_bcc = bcc.execute()
-                img[:, :, 0] = img_bcc
-                current_step += 1
-                self.progress.emit(int((current_step / total_steps) * 100))
-
-            self.finished.emit(img.astype(np.uint8))
+            pipeline = Pipeline(self.selected_modules, self.parameters, cache=self.cache,
+                                preview=self.preview)
+            img = pipeline.execute(self.rawimg, self.progress.emit)
+            view = img
+            if img.ndim == 3 and 'csc' in [stage.name for stage in pipeline.stages]:
+                img = img.astype(np.uint8)
+                view = yuv_to_rgb(img, as_matrix(pipeline.parameters, 'csc_', 3, 4, 1024))
+            # conversion and pyramid here, off the UI thread
+            self.finished.emit(img, pyramid(display_array(view)))
 
         except Exception as e:
             self.error.emit(f"Processing error: {str(e)}")
@@ -282,12 +98,20 @@ class ParameterPanel(QWidget):
                     control = QSpinBox()
                     control.setRange(-1000, 2048)
                     control.setValue(int(default_value))
+            elif param_type == 'text':
+                control = QLineEdit(str(default_value))
             else:
                 control = QComboBox()
                 control.addItems(param_info.get('options', []))
+                control.setCurrentText(str(default_value))
 
             self.controls[param_name] = control
-            control.valueChanged.connect(self.on_parameter_changed)
+            if isinstance(control, QComboBox):
+                control.currentTextChanged.connect(self.on_parameter_changed)
+            elif isinstance(control, QLineEdit):
+                control.editingFinished.connect(self.on_parameter_changed)
+            else:
+                control.valueChanged.connect(self.on_parameter_changed)
 
             grid.addWidget(label, row, 0)
             grid.addWidget(control, row, 1)
@@ -304,6 +128,8 @@ class ParameterPanel(QWidget):
                 params[name] = control.value()
             elif isinstance(control, QSlider):
                 params[name] = control.value()
+            elif isinstance(control, QLineEdit):
+                params[name] = control.text()
             else:
                 params[name] = control.currentText()
         self.parameter_changed.emit(params)
@@ -315,28 +141,155 @@ class ParameterPanel(QWidget):
                 params[name] = control.value()
             elif isinstance(control, QSlider):
                 params[name] = control.value()
+            elif isinstance(control, QLineEdit):
+                params[name] = control.text()
             else:
                 params[name] = control.currentText()
         return params
 
 
-class ImageCanvas(FigureCanvasQTAgg):
-    """Matplotlib canvas for image display"""
+def display_array(image):
+    """
+    uint8 C-contiguous (H, W, 3) RGB or (H, W) gray for an ImageView: uint8 images as
+    they are, any other dtype (RAW, RGB of a chain stopping before CSC) stretched from
+    its min to its max over all channels.
+    """
+    if image.dtype != np.uint8:
+        lo = float(image.min())
+        hi = float(image.max())
+        scale = 255 / (hi - lo) if hi > lo else 0
+        image = ((image - lo) * scale + 0.5).astype(np.uint8)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+def as_qimage(img):
+    'QImage sharing the memory of a uint8 (H, W, 3) or (H, W) array, the array must outlive it'
+    fmt = QImage.Format_RGB888 if img.ndim == 3 else QImage.Format_Grayscale8
+    return QImage(img.data, img.shape[1], img.shape[0], img.strides[0], fmt)
+
+
+class ImageView(QWidget):
+    """
+    Zoomable, pannable image display. The image is kept as a mip pyramid of QImages
+    wrapping the arrays without a copy; each paint draws only the visible part of the
+    level closest above the zoom, so the cost follows the widget size, not the image.
+    Wheel zooms around the cursor, drag pans, double click fits to the window.
+    """
+
+    MAX_SCALE = 32
 
     def __init__(self, parent=None):
-        fig = Figure(figsize=(5, 4), dpi=100)
-        self.axes = fig.add_subplot(111)
-        super().__init__(fig)
-        self.setParent(parent)
+        super().__init__(parent)
+        self.levels = []        # uint8 arrays, level k is 2^k x 2^k binned
+        self.qimages = []       # QImage views of self.levels
+        self.scale = 1.0        # widget pixels per image pixel
+        self.center = QPointF() # image point shown at the widget center
+        self.fit = True
+        self.drag = None
+        self.setMinimumSize(200, 150)
 
     def display_image(self, image):
-        self.axes.clear()
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            self.axes.imshow(cv2.cvtColor(image.astype(np.uint8), cv2.COLOR_YUV2RGB))
-        else:
-            self.axes.imshow(image.astype(np.uint8), cmap='gray')
-        self.axes.axis('off')
-        self.draw()
+        self.set_levels(pyramid(display_array(image)))
+
+    def set_levels(self, levels):
+        'show a pyramid from model.preview.pyramid; zoom and pan are kept for a same-size image'
+        same_size = bool(self.levels) and self.levels[0].shape[:2] == levels[0].shape[:2]
+        self.levels = levels
+        self.qimages = [as_qimage(level) for level in levels]
+        if not same_size:
+            self.fit_to_window()
+        self.update()
+
+    def image_size(self):
+        return self.levels[0].shape[1], self.levels[0].shape[0]
+
+    def fit_to_window(self):
+        self.fit = True
+        if not self.levels:
+            return
+        img_w, img_h = self.image_size()
+        self.scale = min(max(self.width(), 1) / img_w, max(self.height(), 1) / img_h)
+        self.center = QPointF(img_w / 2, img_h / 2)
+        self.update()
+
+    def zoom(self, factor, anchor):
+        'scale by factor keeping the image point under the widget point anchor in place'
+        img_w, img_h = self.image_size()
+        fit_scale = min(max(self.width(), 1) / img_w, max(self.height(), 1) / img_h)
+        scale = min(max(self.scale * factor, min(fit_scale, 1.0)), self.MAX_SCALE)
+        offset = anchor - QPointF(self.width() / 2, self.height() / 2)
+        point = self.center + offset / self.scale
+        self.scale = scale
+        self.center = point - offset / scale
+        self.fit = False
+        self.clamp()
+        self.update()
+
+    def clamp(self):
+        img_w, img_h = self.image_size()
+        self.center = QPointF(min(max(self.center.x(), 0), img_w), min(max(self.center.y(), 0), img_h))
+
+    def level(self):
+        'index of the coarsest level still at least as detailed as the display'
+        k = 0
+        while k + 1 < len(self.levels) and 2 ** (k + 1) <= 1 / self.scale:
+            k += 1
+        return k
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(32, 32, 32))
+        if not self.levels:
+            return
+        img_w, img_h = self.image_size()
+        # visible part of the image, in level-0 pixels
+        half_w = self.width() / 2 / self.scale
+        half_h = self.height() / 2 / self.scale
+        x0 = max(self.center.x() - half_w, 0)
+        y0 = max(self.center.y() - half_h, 0)
+        x1 = min(self.center.x() + half_w, img_w)
+        y1 = min(self.center.y() + half_h, img_h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        k = self.level()
+        level_h, level_w = self.levels[k].shape[:2]
+        fx = level_w / img_w
+        fy = level_h / img_h
+        source = QRectF(x0 * fx, y0 * fy, (x1 - x0) * fx, (y1 - y0) * fy)
+        target = QRectF((x0 - self.center.x()) * self.scale + self.width() / 2,
+                        (y0 - self.center.y()) * self.scale + self.height() / 2,
+                        (x1 - x0) * self.scale, (y1 - y0) * self.scale)
+        # filtered when shrinking, nearest pixels when zoomed in past 1:1
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, self.scale < fx)
+        painter.drawImage(target, self.qimages[k], source)
+
+    def resizeEvent(self, event):
+        if self.fit:
+            self.fit_to_window()
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        if self.levels:
+            self.zoom(1.25 ** (event.angleDelta().y() / 120), QPointF(event.pos()))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag = QPointF(event.pos())
+
+    def mouseMoveEvent(self, event):
+        if self.drag is not None and self.levels:
+            pos = QPointF(event.pos())
+            self.center -= (pos - self.drag) / self.scale
+            self.drag = pos
+            self.fit = False
+            self.clamp()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_window()
 
 
 class ISPGUIApplication(QMainWindow):
@@ -351,9 +304,12 @@ class ISPGUIApplication(QMainWindow):
         self.processed_image = None
         self.parameters = {}
         self.load_parameters()
+        # stage outputs of earlier runs, a parameter tweak only reruns the stages it affects
+        self.stage_cache = StageCache()
 
         self.init_ui()
         self.processing_thread = None
+        self.reprocess_pending = False
 
     def load_parameters(self):
         """Load parameters from config.csv"""
@@ -361,30 +317,24 @@ class ISPGUIApplication(QMainWindow):
         self.parameters = OrderedDict()
 
         try:
-            with open(config_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f, delimiter=',')
-                for row in reader:
-                    if len(row) >= 2:
-                        param_name = row[0].strip()
-                        param_value = row[1].strip()
-                        param_desc = row[2].strip() if len(row) > 2 else ''
-
-                        # Determine parameter type
-                        if param_name in ['bayer_pattern', 'dpc_mode', 'cfa_mode']:
-                            param_type = 'combo'
-                            options = ['rggb', 'bggr', 'gbrg', 'grbg'] if param_name == 'bayer_pattern' else \
-                                     ['gradient'] if param_name == 'dpc_mode' else ['malvar', 'bilinear']
-                        elif any(f in param_name for f in ['_gain', '_alpha', '_beta', 'csc']):
-                            param_type = 'float'
-                        else:
-                            param_type = 'int'
-
-                        self.parameters[param_name] = {
-                            'value': param_value,
-                            'type': param_type,
-                            'description': param_desc,
-                            'options': options if param_type == 'combo' else []
-                        }
+            for param_name, param_value in load_parameters(config_path).items():
+                param, _ = ROWS[param_name]
+                # widget type from the config schema
+                if param.choices is not None:
+                    param_type = 'combo'
+                elif param.type is float:
+                    param_type = 'float'
+                elif param.type is str:
+                    param_type = 'text'
+                else:
+                    param_type = 'int'
+
+                self.parameters[param_name] = {
+                    'value': param_value,
+                    'type': param_type,
+                    'description': param.description,
+                    'options': list(param.choices) if param_type == 'combo' else []
+                }
         except FileNotFoundError:
             QMessageBox.warning(self, 'Warning', f'Config file not found: {config_path}')
 
@@ -415,7 +365,7 @@ class ISPGUIApplication(QMainWindow):
         module_group = QGroupBox('Select Processing Modules')
         module_layout = QVBoxLayout()
         self.module_list = QListWidget()
-        modules = ['dpc', 'blc', 'aaf', 'awb', 'cnf', 'cfa', 'ccm', 'gc', 'csc', 'nlm', 'bnf', 'ee', 'fcs', 'hsc', 'bcc']
+        modules = ['dpc', 'blc', 'lsc', 'aaf', 'awb', 'cnf', 'cfa', 'ccm', 'gc', 'csc', 'nlm', 'bnf', 'ee', 'fcs', 'hsc', 'bcc']
         for module in modules:
             self.module_list.addItem(module)
             item = self.module_list.item(self.module_list.count() - 1)
@@ -433,11 +383,24 @@ class ISPGUIApplication(QMainWindow):
         param_group.setLayout(param_layout)
         left_layout.addWidget(param_group)
 
+        # Preview mode: binned proxy re-processed on every parameter change
+        preview_layout = QHBoxLayout()
+        preview_layout.addWidget(QLabel('Preview:'))
+        self.preview_combo = QComboBox()
+        for factor in PREVIEW_FACTORS:
+            self.preview_combo.addItem('Full resolution' if factor == 1 else f'{factor}x{factor} binned', factor)
+        preview_layout.addWidget(self.preview_combo)
+        left_layout.addLayout(preview_layout)
+
         # Process button
         process_btn = QPushButton('Process Image')
-        process_btn.clicked.connect(self.process_image)
+        process_btn.clicked.connect(lambda: self.process_image())
         left_layout.addWidget(process_btn)
 
+        render_btn = QPushButton('Render Full Resolution')
+        render_btn.clicked.connect(lambda: self.process_image(preview=1))
+        left_layout.addWidget(render_btn)
+
         # Progress bar
         self.progress_bar = QProgressBar()
         self.progress_bar.setValue(0)
@@ -452,15 +415,15 @@ class ISPGUIApplication(QMainWindow):
         # Original image
         original_group = QGroupBox('Original Image')
         original_layout = QVBoxLayout()
-        self.original_canvas = ImageCanvas(self)
-        original_layout.addWidget(self.original_canvas)
+        self.original_view = ImageView(self)
+        original_layout.addWidget(self.original_view)
         original_group.setLayout(original_layout)
 
         # Processed image
         processed_group = QGroupBox('Processed Image')
         processed_layout = QVBoxLayout()
-        self.processed_canvas = ImageCanvas(self)
-        processed_layout.addWidget(self.processed_canvas)
+        self.processed_view = ImageView(self)
+        processed_layout.addWidget(self.processed_view)
         processed_group.setLayout(processed_layout)
 
         right_layout.addWidget(original_group, 1)
@@ -493,7 +456,7 @@ class ISPGUIApplication(QMainWindow):
                     img = cv2.imread(file_path)
                     self.raw_image = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).astype(np.uint16)
 
-                self.original_canvas.display_image(self.raw_image)
+                self.original_view.display_image(self.raw_image)
                 self.statusBar().showMessage(f'Loaded: {file_path}')
             except Exception as e:
                 QMessageBox.critical(self, 'Error', f'Failed to load image: {str(e)}')
@@ -522,13 +485,21 @@ class ISPGUIApplication(QMainWindow):
 
     def on_parameters_changed(self, params):
         """Handle parameter changes"""
-        pass
+        # live tuning loop on the proxy, full resolution only on demand
+        if self.preview_combo.currentData() > 1 and self.raw_image is not None:
+            if self.processing_thread is None or not self.processing_thread.isRunning():
+                self.process_image()
+            else:
+                # picked up when the running proxy finishes, so the last value gets rendered
+                self.reprocess_pending = True
 
-    def process_image(self):
+    def process_image(self, preview=None):
         """Process image with selected modules"""
         if self.raw_image is None:
             QMessageBox.warning(self, 'Warning', 'Please load an image first')
             return
+        if preview is None:
+            preview = self.preview_combo.currentData()
 
         # Get selected modules
         selected_modules = []
@@ -540,7 +511,8 @@ class ISPGUIApplication(QMainWindow):
         params = self.param_panel.get_parameters()
 
         # Start processing thread
-        self.processing_thread = ImageProcessingThread(self.raw_image, params, selected_modules)
+        self.processing_thread = ImageProcessingThread(self.raw_image, params, selected_modules,
+                                                       self.stage_cache, preview)
         self.processing_thread.progress.connect(self.update_progress)
         self.processing_thread.finished.connect(self.on_processing_finished)
         self.processing_thread.error.connect(self.on_processing_error)
@@ -552,17 +524,30 @@ class ISPGUIApplication(QMainWindow):
         """Update progress bar"""
         self.progress_bar.setValue(value)
 
-    def on_processing_finished(self, image):
+    def on_processing_finished(self, image, levels):
         """Handle processing completion"""
         self.processed_image = image
-        self.processed_canvas.display_image(image)
+        self.processed_view.set_levels(levels)
         self.progress_bar.setValue(100)
         self.statusBar().showMessage('Processing completed')
+        self.process_pending()
 
     def on_processing_error(self, error_msg):
         """Handle processing error"""
         QMessageBox.critical(self, 'Processing Error', error_msg)
         self.statusBar().showMessage('Processing failed')
+        self.process_pending()
+
+    def process_pending(self):
+        """Rerun the proxy for parameter changes made while the last run was busy"""
+        if not self.reprocess_pending:
+            return
+        self.reprocess_pending = False
+        if self.preview_combo.currentData() == 1:
+            return      # full resolution renders only on demand
+        # the result signal is emitted from run(), let the thread return before replacing it
+        self.processing_thread.wait()
+        self.process_image()
 
 
 def main():
@@ -9,25 +9,12 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 import numpy as np
-import csv
 from collections import OrderedDict
 from PIL import Image, ImageTk
 
-from model.dpc import DPC
-from model.blc import BLC
-from model.aaf import AAF
-from model.awb import WBGC
-from model.cnf import CNF
-from model.cfa import CFA
-from model.gac import GC
-from model.ccm import CCM
-from model.csc import CSC
-from model.bnf import BNF
-from model.eeh import EE
-from model.fcs import FCS
-from model.bcc import BCC
-from model.hsc import HSC
-from model.nlm import NLM
+from model.config import ROWS
+from model.pipeline import Pipeline, StageCache, load_parameters
+from model.preview import PREVIEW_FACTORS
 
 
 class ISPProcessingEngine:
@@ -36,6 +23,8 @@ class ISPProcessingEngine:
     def __init__(self):
         self.parameters = {}
         self.load_parameters()
+        # stage outputs of earlier runs, a parameter tweak only reruns the stages it affects
+        self.cache = StageCache()
         
     def load_parameters(self):
         """從config.csv加載參數"""
@@ -43,214 +32,15 @@ class ISPProcessingEngine:
         self.parameters = OrderedDict()
         
         try:
-            with open(config_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f, delimiter=',')
-                for row in reader:
-                    if len(row) >= 2:
-                        param_name = row[0].strip()
-                        param_value = row[1].strip()
-                        self.parameters[param_name] = param_value
+            self.parameters = load_parameters(config_path)
         except FileNotFoundError:
             print(f'Warning: Config file not found: {config_path}')
     
-    def process(self, rawimg, selected_modules, param_dict, progress_callback=None):
+    def process(self, rawimg, selected_modules, param_dict, progress_callback=None, preview=1):
         """處理圖像"""
         try:
-            img = rawimg.copy().astype(np.float32)
-            total_steps = len(selected_modules)
-            current_step = 0
-            
-            # RAW Domain
-            if 'dpc' in selected_modules:
-                dpc = DPC(img.astype(np.uint16), int(param_dict.get('dpc_thres', 30)),
-                         param_dict.get('dpc_mode', 'gradient'), int(param_dict.get('dpc_clip', 1023)))
-                img = dpc.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'blc' in selected_modules:
-                parameter = [int(param_dict.get('bl_r', 0)), int(param_dict.get('bl_gr', 0)),
-                           int(param_dict.get('bl_gb', 0)), int(param_dict.get('bl_b', 0)),
-                           int(param_dict.get('alpha', 0)), int(param_dict.get('beta', 0))]
-                blc = BLC(img.astype(np.uint16), parameter, param_dict.get('bayer_pattern', 'rggb'),
-                         int(param_dict.get('blc_clip', 1023)))
-                img = blc.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'aaf' in selected_modules:
-                aaf = AAF(img.astype(np.uint16))
-                img = aaf.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'awb' in selected_modules:
-                parameter = [float(param_dict.get('r_gain', 1.5)), float(param_dict.get('gr_gain', 1.0)),
-                           float(param_dict.get('gb_gain', 1.0)), float(param_dict.get('b_gain', 1.1))]
-                awb = WBGC(img.astype(np.uint16), parameter, param_dict.get('bayer_pattern', 'rggb'),
-                          int(param_dict.get('awb_clip', 1023)))
-                img = awb.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'cnf' in selected_modules:
-                parameter = [float(param_dict.get('r_gain', 1.5)), float(param_dict.get('gr_gain', 1.0)),
-                           float(param_dict.get('gb_gain', 1.0)), float(param_dict.get('b_gain', 1.1))]
-                cnf = CNF(img.astype(np.uint16), param_dict.get('bayer_pattern', 'rggb'), 0, parameter, 1023)
-                img = cnf.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            # RGB Domain
-            if 'cfa' in selected_modules:
-                cfa = CFA(img.astype(np.uint16), param_dict.get('cfa_mode', 'malvar'),
-                         param_dict.get('bayer_pattern', 'rggb'), int(param_dict.get('cfa_clip', 1023)))
-                img = cfa.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'ccm' in selected_modules:
-                ccm_matrix = np.array([
-                    [int(param_dict.get('ccm_00', 1024)), int(param_dict.get('ccm_01', 0)),
-                     int(param_dict.get('ccm_02', 0)), int(param_dict.get('ccm_03', 0))],
-                    [int(param_dict.get('ccm_10', 0)), int(param_dict.get('ccm_11', 1024)),
-                     int(param_dict.get('ccm_12', 0)), int(param_dict.get('ccm_13', 0))],
-                    [int(param_dict.get('ccm_20', 0)), int(param_dict.get('ccm_21', 0)),
-                     int(param_dict.get('ccm_22', 1024)), int(param_dict.get('ccm_23', 0))]
-                ])
-                ccm = CCM(img.astype(np.uint16), ccm_matrix)
-                img = ccm.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'gc' in selected_modules:
-                bw = 10
-                gamma = 0.5
-                maxval = pow(2, bw)
-                ind = range(0, maxval)
-                val = [round(pow(float(i) / maxval, gamma) * maxval) for i in ind]
-                lut = dict(zip(ind, val))
-                gc = GC(img.astype(np.uint16), lut, 'rgb')
-                img = gc.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            # Color Space Conversion
-            if 'csc' in selected_modules:
-                csc_matrix = np.array([
-                    [1024 * float(param_dict.get('csc_00', 0.257)), 1024 * float(param_dict.get('csc_01', 0.504)),
-                     1024 * float(param_dict.get('csc_02', 0.098)), 1024 * float(param_dict.get('csc_03', 16))],
-                    [1024 * float(param_dict.get('csc_10', -0.148)), 1024 * float(param_dict.get('csc_11', -0.291)),
-                     1024 * float(param_dict.get('csc_12', 0.439)), 1024 * float(param_dict.get('csc_13', 128))],
-                    [1024 * float(param_dict.get('csc_20', 0.439)), 1024 * float(param_dict.get('csc_21', -0.368)),
-                     1024 * float(param_dict.get('csc_22', -0.071)), 1024 * float(param_dict.get('csc_23', 128))]
-                ])
-                csc = CSC(img.astype(np.uint16), csc_matrix)
-                img = csc.execute()
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            # YUV Domain
-            if 'nlm' in selected_modules:
-                nlm = NLM(img[:, :, 0].astype(np.uint16), 1, 4,
-                         int(param_dict.get('nlm_h', 10)), int(param_dict.get('nlm_clip', 255)))
-                img_nlm = nlm.execute()
-                img[:, :, 0] = img_nlm
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'bnf' in selected_modules:
-                bnf_dw = np.array([
-                    [int(param_dict.get('bnf_dw_00', 8)), int(param_dict.get('bnf_dw_01', 12)),
-                     int(param_dict.get('bnf_dw_02', 32)), int(param_dict.get('bnf_dw_03', 12)),
-                     int(param_dict.get('bnf_dw_04', 8))],
-                    [int(param_dict.get('bnf_dw_10', 12)), int(param_dict.get('bnf_dw_11', 64)),
-                     int(param_dict.get('bnf_dw_12', 128)), int(param_dict.get('bnf_dw_13', 64)),
-                     int(param_dict.get('bnf_dw_14', 12))],
-                    [int(param_dict.get('bnf_dw_20', 32)), int(param_dict.get('bnf_dw_21', 128)),
-                     int(param_dict.get('bnf_dw_22', 1024)), int(param_dict.get('bnf_dw_23', 128)),
-                     int(param_dict.get('bnf_dw_24', 32))],
-                    [int(param_dict.get('bnf_dw_30', 12)), int(param_dict.get('bnf_dw_31', 64)),
-                     int(param_dict.get('bnf_dw_32', 128)), int(param_dict.get('bnf_dw_33', 64)),
-                     int(param_dict.get('bnf_dw_34', 12))],
-                    [int(param_dict.get('bnf_dw_40', 8)), int(param_dict.get('bnf_dw_41', 12)),
-                     int(param_dict.get('bnf_dw_42', 32)), int(param_dict.get('bnf_dw_43', 12)),
-                     int(param_dict.get('bnf_dw_44', 8))]
-                ])
-                bnf_rw = [int(param_dict.get('bnf_rw_0', 1)), int(param_dict.get('bnf_rw_1', 8)),
-                         int(param_dict.get('bnf_rw_2', 16)), int(param_dict.get('bnf_rw_3', 32))]
-                bnf_rthres = [int(param_dict.get('bnf_rthres_0', 128)), int(param_dict.get('bnf_rthres_1', 32)),
-                             int(param_dict.get('bnf_rthres_2', 8))]
-                bnf = BNF(img[:, :, 0].astype(np.uint16), bnf_dw, bnf_rw, bnf_rthres,
-                         int(param_dict.get('bnf_clip', 255)))
-                img_bnf = bnf.execute()
-                img[:, :, 0] = img_bnf
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'ee' in selected_modules:
-                edge_filter = np.array([
-                    [int(param_dict.get('edge_filter_00', -1)), int(param_dict.get('edge_filter_01', 0)),
-                     int(param_dict.get('edge_filter_02', -1)), int(param_dict.get('edge_filter_03', 0)),
-                     int(param_dict.get('edge_filter_04', -1))],
-                    [int(param_dict.get('edge_filter_10', -1)), int(param_dict.get('edge_filter_11', 0)),
-                     int(param_dict.get('edge_filter_12', 8)), int(param_dict.get('edge_filter_13', 0)),
-                     int(param_dict.get('edge_filter_14', -1))],
-                    [int(param_dict.get('edge_filter_20', -1)), int(param_dict.get('edge_filter_21', 0)),
-                     int(param_dict.get('edge_filter_22', -1)), int(param_dict.get('edge_filter_23', 0)),
-                     int(param_dict.get('edge_filter_24', -1))]
-                ])
-                ee_gain = [int(param_dict.get('ee_gain_min', 32)), int(param_dict.get('ee_gain_max', 128))]
-                ee_thres = [int(param_dict.get('ee_thres_min', 32)), int(param_dict.get('ee_thres_max', 64))]
-                ee_emclip = [int(param_dict.get('ee_emclip_min', -64)), int(param_dict.get('ee_emclip_max', 64))]
-                ee = EE(img[:, :, 0].astype(np.uint16), edge_filter, ee_gain, ee_thres, ee_emclip)
-                img_ee, _ = ee.execute()
-                img[:, :, 0] = img_ee
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'fcs' in selected_modules:
-                fcs_edge = [int(param_dict.get('fcs_edge_min', 32)), int(param_dict.get('fcs_edge_max', 64))]
-                fcs = FCS(img[:, :, 1:3], np.zeros_like(img[:, :, 0]), fcs_edge,
-                         int(param_dict.get('fcs_gain', 32)), int(param_dict.get('fcs_intercept', 2)),
-                         int(param_dict.get('fcs_slope', 3)))
-                img_fcs = fcs.execute()
-                img[:, :, 1:3] = img_fcs
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'hsc' in selected_modules:
-                hsc = HSC(img[:, :, 1:3], int(param_dict.get('hue', 128)),
-                         int(param_dict.get('saturation', 256)), int(param_dict.get('hsc_clip', 255)))
-                img_hsc = hsc.execute()
-                img[:, :, 1:3] = img_hsc
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
-            if 'bcc' in selected_modules:
-                contrast = int(param_dict.get('contrast', 10)) / pow(2, 5)
-                bcc = BCC(img[:, :, 0].astype(np.uint16), int(param_dict.get('brightness', 10)),
-                         contrast, int(param_dict.get('bcc_clip', 255)))
-                img_bcc = bcc.execute()
-                img[:, :, 0] = img_bcc
-                current_step += 1
-                if progress_callback:
-                    progress_callback(int((current_step / total_steps) * 100))
-            
+            pipeline = Pipeline(selected_modules, param_dict, cache=self.cache, preview=preview)
+            img = pipeline.execute(rawimg, progress_callback)
             return img.astype(np.uint8)
         
         except Exception as e:
@@ -260,6 +50,9 @@ class ISPProcessingEngine:
 class ISPGUIApplication(tk.Tk):
     """OpenISP GUI應用主窗口"""
     
+    # quiet time after the last keystroke before a preview run picks the entries up
+    PARAMETER_DELAY_MS = 400
+    
     def __init__(self):
         super().__init__()
         self.title('OpenISP - Image Signal Processor GUI')
@@ -269,6 +62,8 @@ class ISPGUIApplication(tk.Tk):
         self.raw_image = None
         self.processed_image = None
         self.processing = False
+        self.reprocess_pending = False  # entries changed while a preview run was busy
+        self.parameter_timer = None
         
         self.init_ui()
         
@@ -306,7 +101,7 @@ class ISPGUIApplication(tk.Tk):
         canvas.configure(yscrollcommand=scrollbar.set)
         
         self.module_vars = {}
-        for module in ['dpc', 'blc', 'aaf', 'awb', 'cnf', 'cfa', 'ccm', 'gc', 'csc', 'nlm', 'bnf', 'ee', 'fcs', 'hsc', 'bcc']:
+        for module in ['dpc', 'blc', 'lsc', 'aaf', 'awb', 'cnf', 'cfa', 'ccm', 'gc', 'csc', 'nlm', 'bnf', 'ee', 'fcs', 'hsc', 'bcc']:
             var = tk.BooleanVar(value=True)
             self.module_vars[module] = var
             ttk.Checkbutton(scrollable_frame, text=module.upper(), variable=var).pack(anchor=tk.W, padx=5)
@@ -341,14 +136,27 @@ class ISPGUIApplication(tk.Tk):
             ttk.Label(frame, text=f"{param}:", width=15).pack(side=tk.LEFT)
             
             var = tk.StringVar(value=default_val)
+            var.trace_add('write', self.on_parameter_changed)
             self.param_vars[param] = var
             ttk.Entry(frame, textvariable=var, width=10).pack(side=tk.LEFT, padx=5)
         
         param_canvas.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         param_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # Preview Mode: binned proxy re-processed on every parameter change
+        preview_frame = ttk.Frame(left_frame)
+        preview_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(preview_frame, text='Preview:').pack(side=tk.LEFT)
+        self.preview_choices = OrderedDict(
+            ('Full resolution' if factor == 1 else f'{factor}x{factor} binned', factor) for factor in PREVIEW_FACTORS)
+        self.preview_var = tk.StringVar(value=next(iter(self.preview_choices)))
+        ttk.Combobox(preview_frame, textvariable=self.preview_var, values=list(self.preview_choices),
+                     state='readonly', width=16).pack(side=tk.LEFT, padx=5)
+        
         # Process Button
         ttk.Button(left_frame, text='▶ Process Image', command=self.process_image).pack(fill=tk.X, pady=10)
+        ttk.Button(left_frame, text='Render Full Resolution',
+                   command=lambda: self.process_image(preview=1)).pack(fill=tk.X)
         
         # Progress Bar
         self.progress_var = tk.IntVar()
@@ -433,11 +241,48 @@ class ISPGUIApplication(tk.Tk):
         label.config(image=photo)
         label.image = photo
     
-    def process_image(self):
+    def on_parameter_changed(self, *args):
+        """參數輸入停頓後才重新處理, 避免處理輸入到一半的數值"""
+        if self.parameter_timer is not None:
+            self.after_cancel(self.parameter_timer)
+        self.parameter_timer = self.after(self.PARAMETER_DELAY_MS, self.preview_parameters)
+    
+    def preview_parameters(self):
+        """預覽模式下以目前參數重新處理, 處理中則等本次結束後再處理"""
+        self.parameter_timer = None
+        if self.preview_choices[self.preview_var.get()] == 1 or self.raw_image is None:
+            return      # full resolution renders only on demand
+        if self.processing:
+            self.reprocess_pending = True
+            return
+        try:
+            self.read_parameters()
+        except ValueError as e:
+            self.status_label.config(text=f'Invalid parameter: {e}')
+            return
+        self.process_image()
+    
+    def process_pending(self):
+        """處理結束後補做處理期間的參數修改"""
+        if self.reprocess_pending:
+            self.reprocess_pending = False
+            self.preview_parameters()
+    
+    def read_parameters(self):
+        """config參數加上輸入框的值, 依config schema轉型, 無效值拋出ValueError"""
+        params = dict(self.engine.parameters)
+        for param_name, var in self.param_vars.items():
+            param, _ = ROWS[param_name]
+            params[param_name] = param.convert(var.get().strip(), param_name)
+        return params
+    
+    def process_image(self, preview=None):
         """處理圖像"""
         if self.raw_image is None:
             messagebox.showwarning('Warning', 'Please load an image first')
             return
+        if preview is None:
+            preview = self.preview_choices[self.preview_var.get()]
         
         if self.processing:
             messagebox.showwarning('Warning', 'Processing is already running')
@@ -449,16 +294,12 @@ class ISPGUIApplication(tk.Tk):
             messagebox.showwarning('Warning', 'Please select at least one module')
             return
         
-        # Get parameters
-        params = {}
-        for param_name, param_value in self.engine.parameters.items():
-            if param_name in self.param_vars:
-                try:
-                    params[param_name] = float(self.param_vars[param_name].get())
-                except:
-                    params[param_name] = param_value
-            else:
-                params[param_name] = param_value
+        # Get parameters, typed like config.csv so cache keys match the config values
+        try:
+            params = self.read_parameters()
+        except ValueError as e:
+            messagebox.showwarning('Warning', f'Invalid parameter: {e}')
+            return
         
         self.processing = True
         self.status_label.config(text='Processing...')
@@ -469,7 +310,7 @@ class ISPGUIApplication(tk.Tk):
                     self.progress_var.set(val)
                     self.update()
                 
-                result = self.engine.process(self.raw_image, selected, params, progress_cb)
+                result = self.engine.process(self.raw_image, selected, params, progress_cb, preview)
                 self.processed_image = result
                 self.display_image(result, self.proc_label)
                 
@@ -480,6 +321,7 @@ class ISPGUIApplication(tk.Tk):
                 messagebox.showerror('Error', f'Processing failed: {e}')
                 self.status_label.config(text='Failed')
                 self.processing = False
+            self.after(0, self.process_pending)
         
         thread = threading.Thread(target=process_thread, daemon=True)
         thread.start()
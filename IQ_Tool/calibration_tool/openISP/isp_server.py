@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ISP daemon
+Keeps a configured openISP pipeline resident behind a localhost HTTP endpoint, so the
+imports, config parsing, kernel compilation and LUTs are paid once per session instead
+of once per run. Frames are processed on a bounded worker pool (model.service); clients
+get 503 when it is full. Use model.service.ISPClient from the GUIs and test scripts:
+
+    from model.service import ISPClient
+    yuv = ISPClient().process(rawimg)
+    rgb = ISPClient().process('./raw/test.RAW', width=1920, height=1080, output='rgb')
+
+or plain HTTP:
+
+    curl --data-binary @test.RAW 'http://127.0.0.1:8765/process?width=1920&height=1080&nlm_h=8' -o out.npy
+
+usage: python isp_server.py [-c CONFIG] [--host HOST] [--port PORT] [-j WORKERS] [--queue N]
+                            [--cache-mb MB] [--backend numba|numpy] [-v]
+"""
+
+import argparse
+import time
+
+from model.backend import BACKENDS, set_backend
+from model.pipeline import STAGE_ORDER, load_parameters
+from model.service import ISPService, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description='openISP daemon')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='config.csv path')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on, keep it local')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('-j', '--workers', type=int, default=2, help='frames processed at the same time')
+    parser.add_argument('--queue', type=int, default=4, help='frames waiting for a worker before 503')
+    parser.add_argument('--cache-mb', type=int, default=512, help='stage cache budget, 0 disables it')
+    parser.add_argument('--backend', choices=BACKENDS, help='force a kernel backend, default: fastest installed')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+    if args.backend:
+        set_backend(args.backend)
+
+    service = ISPService(load_parameters(args.config), STAGE_ORDER, args.workers, args.queue,
+                         args.cache_mb * 1024 * 1024)
+    print(f'warming up ({service.warm():.3f} s)')
+    server = serve(service, args.host, args.port, args.verbose)
+    host, port = server.server_address[:2]
+    print(f'serving {args.config} on http://{host}:{port} with {args.workers} workers, Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        status = service.status()
+        print(f"{status['processed']} frames processed, {status['failed']} failed "
+              f"in {time.time() - service.started:.0f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming ISP runner
+Runs every frame of a concatenated RAW (burst or video dump) through the openISP
+pipeline with model.stream.StreamPipeline: RAW, RGB and YUV stage groups work on
+consecutive frames at the same time, frames come out in order and are saved as
+<name>_<frame>.npy.
+
+usage: python isp_stream.py INPUT [-c CONFIG] [-o OUT_DIR] [--depth N] [--width W --height H]
+                            [--format raw10|raw12|raw14|raw16] [--stride BYTES] [--offset BYTES]
+  --depth      frames allowed to wait between two stage groups
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from model.pipeline import Pipeline, STAGE_ORDER, load_parameters
+from model.backend import BACKENDS, set_backend
+from model.rawio import RAW_FORMATS
+from model.stream import StreamPipeline, raw_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='openISP streaming runner')
+    parser.add_argument('input', help='RAW file holding one or more frames back to back')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='config.csv path')
+    parser.add_argument('-o', '--out-dir', default='./out', help='output directory')
+    parser.add_argument('--depth', type=int, default=2, help='queue depth between stage groups')
+    parser.add_argument('--width', type=int, help='RAW width, defaults to raw_w of the config')
+    parser.add_argument('--height', type=int, help='RAW height, defaults to raw_h of the config')
+    parser.add_argument('--format', default='raw16', choices=list(RAW_FORMATS), help='RAW packing')
+    parser.add_argument('--stride', type=int, help='line pitch in bytes, defaults to the packed line size')
+    parser.add_argument('--offset', type=int, default=0, help='header bytes before the first frame')
+    parser.add_argument('--bits', type=int, default=10, help='bit depth the pipeline clips at')
+    parser.add_argument('--backend', choices=BACKENDS, help='force a kernel backend, default: fastest installed')
+    args = parser.parse_args()
+    if args.backend:
+        set_backend(args.backend)
+
+    parameters = load_parameters(args.config)
+    raw_w = args.width or int(parameters['raw_w'])
+    raw_h = args.height or int(parameters['raw_h'])
+    os.makedirs(args.out_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.input))[0]
+
+    stream = StreamPipeline(Pipeline(STAGE_ORDER, parameters), args.depth)
+    print('stage groups: ' + ' | '.join(' '.join(stage.name for stage in group) for group in stream.groups))
+    frames = raw_frames(args.input, raw_w, raw_h, args.format, args.stride, args.offset, args.bits)
+    start = time.perf_counter()
+    count = 0
+    for count, img in enumerate(stream.process(frames), 1):
+        out_path = os.path.join(args.out_dir, f'{name}_{count - 1:04d}.npy')
+        np.save(out_path, img)
+        print(f'frame {count - 1} -> {out_path} ({time.perf_counter() - start:.3f} s)')
+    wall = time.perf_counter() - start
+    print(50*'-' + f'\n{count} frames in {wall:.3f} s ({count / wall:.2f} fps)')
+
+
+if __name__ == '__main__':
+    main()
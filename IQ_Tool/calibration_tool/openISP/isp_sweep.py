@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parameter sweep
+Runs one RAW frame through the openISP pipeline for every combination of the given
+parameter values (or an explicit list of points) and scores each output. Stages whose
+parameters and inputs are shared by several points run once (model.sweep.Sweep), the
+remaining work runs on a process pool. Results are written as JSON.
+
+usage: python isp_sweep.py INPUT --set NAME=V1,V2,... [--set ...] [--points FILE]
+                           [-m noise_std,ssim,mtf50] [--reference FILE.npy] [--roi Y0,Y1,X0,X1]
+                           [-c CONFIG] [-j JOBS] [-o OUT.json] [--save-outputs DIR]
+                           [--width W --height H] [--format raw10|raw12|raw14|raw16]
+  --set        one swept parameter, e.g. --set dpc_thres=10,30,50 --set nlm_h=5,10
+  --points     JSON list of {name: value} points, swept instead of / after the --set grid
+  --reference  image ssim compares against, default: the output of the base config
+  --roi        region of the slanted edge mtf50 measures, default: the whole image
+"""
+
+import argparse
+import json
+import os
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from model.backend import BACKENDS, set_backend
+from model.config import ROWS
+from model.metrics import METRICS, mtf50
+from model.pipeline import load_parameters
+from model.rawio import RAW_FORMATS, read_raw
+from model.sweep import Sweep, grid
+
+
+def parse_set(text):
+    'NAME=V1,V2,... -> (name, [typed values]), validated against the config schema'
+    name, _, values = text.partition('=')
+    name = name.strip()
+    if name not in ROWS:
+        raise argparse.ArgumentTypeError(f'unknown parameter {name!r}')
+    param, _ = ROWS[name]
+    try:
+        return name, [param.convert(v.strip(), name) for v in values.split(',') if v.strip()]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='openISP parameter sweep')
+    parser.add_argument('input', help='RAW file')
+    parser.add_argument('--set', dest='variations', type=parse_set, action='append', default=[],
+                        metavar='NAME=V1,V2,...', help='swept parameter and its values')
+    parser.add_argument('--points', help='JSON file with a list of {name: value} points')
+    parser.add_argument('-m', '--metrics', default='noise_std',
+                        help='comma separated list of ' + '/'.join(METRICS))
+    parser.add_argument('--reference', help='.npy image ssim compares against')
+    parser.add_argument('--roi', help='Y0,Y1,X0,X1 of the slanted edge for mtf50')
+    parser.add_argument('-c', '--config', default='./config/config.csv', help='base config.csv')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('-o', '--output', default='./sweep.json', help='results JSON')
+    parser.add_argument('--save-outputs', help='directory for the output image of every point')
+    parser.add_argument('--width', type=int, help='RAW width, defaults to raw_w of the config')
+    parser.add_argument('--height', type=int, help='RAW height, defaults to raw_h of the config')
+    parser.add_argument('--format', default='raw16', choices=list(RAW_FORMATS), help='RAW packing')
+    parser.add_argument('--stride', type=int, help='line pitch in bytes, defaults to the packed line size')
+    parser.add_argument('--offset', type=int, default=0, help='header bytes before the first line')
+    parser.add_argument('--bits', type=int, default=10, help='bit depth the pipeline clips at')
+    parser.add_argument('--backend', choices=BACKENDS, help='force a kernel backend, default: fastest installed')
+    args = parser.parse_args()
+    if args.backend:
+        set_backend(args.backend)
+
+    points = grid(OrderedDict(args.variations)) if args.variations else []
+    if args.points:
+        with open(args.points) as f:
+            for point in json.load(f):
+                try:
+                    points.append({name: ROWS[name][0].convert(value, name) for name, value in point.items()})
+                except KeyError as e:
+                    parser.error(f'{args.points}: unknown parameter {e}')
+                except ValueError as e:
+                    parser.error(f'{args.points}: {e}')
+    if not points:
+        parser.error('nothing to sweep, give --set and/or --points')
+    metrics = OrderedDict()
+    for name in args.metrics.split(','):
+        if name not in METRICS:
+            parser.error(f'unknown metric {name!r}')
+        metrics[name] = METRICS[name]
+    if args.roi:
+        metrics['mtf50'] = partial(mtf50, roi=[int(v) for v in args.roi.split(',')])
+
+    parameters = load_parameters(args.config)
+    raw_w = args.width or int(parameters['raw_w'])
+    raw_h = args.height or int(parameters['raw_h'])
+    rawimg = np.array(read_raw(args.input, raw_w, raw_h, args.format, args.stride, args.offset, out_bits=args.bits))
+    reference = np.load(args.reference) if args.reference else None
+
+    sweep = Sweep(parameters, metrics=metrics, jobs=args.jobs, out_dir=args.save_outputs)
+    results = sweep.run(rawimg, points, reference)
+
+    for result in results:
+        point = ' '.join(f'{name}={value}' for name, value in result['parameters'].items())
+        scores = ' '.join(f'{name}={value:.4f}' for name, value in result['scores'].items())
+        print(f"{result['index']:4d}  {point}  {scores}")
+    stats = sweep.stats
+    print(50*'-' + f"\n{stats['points']} points, {stats['stage_runs']} stage runs instead of "
+          f"{stats['naive_stage_runs']} ({stats['tasks']} tasks), {stats['wall_seconds']:.3f} s")
+    with open(args.output, 'w') as f:
+        json.dump({'config': args.config, 'input': args.input, 'stats': stats, 'results': results}, f, indent=2,
+                  default=str)
+    print(f'results: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
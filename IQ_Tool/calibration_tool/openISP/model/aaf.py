@@ -1,26 +1,29 @@
 #!/usr/bin/python
 import numpy as np
 from scipy.ndimage import correlate
+from model.bayer import as_input, as_planes, planes_out
+
+# the 5x5 mosaic kernel only reads same-color samples: on a Bayer plane it is this 3x3 one
+AAF_KERNEL = np.array([[1, 1, 1],
+                       [1, 8, 1],
+                       [1, 1, 1]]) / 16
 
 class AAF:
     'Anti-aliasing Filter'
 
-    def __init__(self, img):
+    def __init__(self, img, bayer_pattern='rggb'):
         self.img = img
+        self.bayer_pattern = bayer_pattern
 
-    def padding(self):
-        img_pad = np.pad(self.img, (2, 2), 'reflect')
-        return img_pad
+    def padding(self, planes):
+        # edge repeated, the scipy.ndimage 'reflect' border the mosaic filter used
+        return planes.padded(1, 'symmetric')
 
-    def execute(self):
-        img_pad = self.padding()
-        raw_h = self.img.shape[0]
-        raw_w = self.img.shape[1]
-        aaf_img = correlate(self.img, np.array([[1, 0, 1, 0, 1],
-                                                [0, 0, 0, 0, 0],
-                                                [1, 0, 8, 0, 1],
-                                                [0, 0, 0, 0, 0],
-                                                [1, 0, 1, 0, 1]])/16)
+    def execute(self, out=None):
+        planes = as_planes(self.img, self.bayer_pattern)
+        img_pad = self.padding(planes)
+        aaf_img = planes_out(out, planes, planes.dtype)
+        aaf_img.planes[:] = correlate(img_pad, AAF_KERNEL[None])[:, 1:-1, 1:-1]
+        img = self.img
         self.img = aaf_img
-        return self.img
-
+        return as_input(aaf_img, img, out)
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+import os
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# kernel name -> {backend: function}, filled by the stage modules through register()
+KERNELS = {}
+
+# fastest first, 'numpy' is always available and is the reference
+BACKENDS = ('numba', 'numpy')
+
+
+def available_backends():
+    return [name for name in BACKENDS if name != 'numba' or numba is not None]
+
+
+def check_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f'unknown backend {name!r}, expected one of {BACKENDS}')
+    if name not in available_backends():
+        raise ImportError(f'backend {name!r} is not installed')
+    return name
+
+
+# picked at import: OPENISP_BACKEND forces one, otherwise the fastest installed
+BACKEND = check_backend(os.environ.get('OPENISP_BACKEND') or available_backends()[0])
+
+
+def set_backend(name):
+    'force a backend for the kernels looked up from now on'
+    global BACKEND
+    BACKEND = check_backend(name)
+
+
+def jit(function):
+    'Numba-compiled function, None when Numba is not installed so register() skips it'
+    if numba is None:
+        return None
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+def register(name, backend):
+    'decorator adding a kernel implementation, e.g. @register("dpc", "numpy")'
+    def add(function):
+        if function is not None:
+            KERNELS.setdefault(name, {})[backend] = function
+        return function
+    return add
+
+
+def kernel(name, backend=None):
+    'implementation of a kernel for the current (or the given) backend, NumPy when it has none'
+    implementations = KERNELS[name]
+    return implementations.get(backend or BACKEND, implementations['numpy'])
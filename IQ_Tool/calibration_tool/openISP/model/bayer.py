@@ -0,0 +1,140 @@
+#!/usr/bin/python
+import numpy as np
+
+# Bayer phase (row, col) of each color site for the supported patterns
+BAYER_PHASES = {
+    'rggb': {'r': (0, 0), 'gr': (0, 1), 'gb': (1, 0), 'b': (1, 1)},
+    'bggr': {'b': (0, 0), 'gb': (0, 1), 'gr': (1, 0), 'r': (1, 1)},
+    'gbrg': {'gb': (0, 0), 'b': (0, 1), 'r': (1, 0), 'gr': (1, 1)},
+    'grbg': {'gr': (0, 0), 'r': (0, 1), 'b': (1, 0), 'gb': (1, 1)},
+}
+
+# plane order of BayerPlanes.planes, whatever the pattern
+COLORS = ('r', 'gr', 'gb', 'b')
+
+
+def source_index(n, phase, pad, mode):
+    """
+    Mosaic phase and plane index every sample of a padded plane is read from, along one
+    axis of a mosaic of 2n samples. mode is the boundary of the mosaic: 'reflect' as in
+    np.pad (edge not repeated, stays on the same phase) or 'symmetric' (edge repeated,
+    the 'reflect' mode of scipy.ndimage, which crosses into the other phase).
+    """
+    length = 2 * n
+    m = phase + 2 * np.arange(-pad, n + pad)
+    if mode == 'reflect':
+        m = np.where(m < 0, -m, m)
+        m = np.where(m >= length, 2 * (length - 1) - m, m)
+    elif mode == 'symmetric':
+        m = np.where(m < 0, -m - 1, m)
+        m = np.where(m >= length, 2 * length - 1 - m, m)
+    else:
+        raise ValueError(f'unsupported padding mode {mode!r}')
+    return m % 2, m // 2
+
+
+class BayerPlanes:
+    """
+    Bayer mosaic split once into four contiguous quarter-resolution planes, stored as one
+    (4, H/2, W/2) array in COLORS order. RAW-domain stages work on the planes, where
+    same-color neighbours are unit-stride and every color is handled alike whatever the
+    pattern; mosaic() re-interleaves them before demosaicing.
+    """
+
+    def __init__(self, planes, bayer_pattern):
+        self.planes = planes
+        self.bayer_pattern = bayer_pattern
+        self.phases = BAYER_PHASES[bayer_pattern]
+
+    @classmethod
+    def split(cls, img, bayer_pattern, out=None):
+        'planes of a mosaic with even height and width, written to out (BayerPlanes) if given'
+        if img.ndim != 2 or img.shape[0] % 2 or img.shape[1] % 2:
+            raise ValueError(f'expected a Bayer mosaic with even height and width, got shape {img.shape}')
+        if out is None:
+            out = cls(np.empty((4, img.shape[0] // 2, img.shape[1] // 2), img.dtype), bayer_pattern)
+        for k, color in enumerate(COLORS):
+            py, px = out.phases[color]
+            out.planes[k] = img[py::2, px::2]
+        return out
+
+    def mosaic(self, out=None):
+        'interleaved (H, W) mosaic, written to out if given'
+        h, w = self.planes.shape[1:]
+        img = np.empty((2 * h, 2 * w), self.planes.dtype) if out is None else out
+        for k, color in enumerate(COLORS):
+            py, px = self.phases[color]
+            img[py::2, px::2] = self.planes[k]
+        return img
+
+    def __getitem__(self, color):
+        return self.planes[COLORS.index(color)]
+
+    def empty(self, dtype=None):
+        'uninitialised planes of the same size and pattern, for a stage output'
+        return BayerPlanes(np.empty_like(self.planes, dtype), self.bayer_pattern)
+
+    def astype(self, dtype):
+        return BayerPlanes(self.planes.astype(dtype), self.bayer_pattern)
+
+    def padded(self, pad, mode='reflect'):
+        """
+        (4, H/2 + 2 pad, W/2 + 2 pad) planes equal to the planes of the mosaic padded by
+        2 pad samples, so a stage keeps the border handling it had on the mosaic.
+        """
+        h, w = self.planes.shape[1:]
+        out = np.empty((4, h + 2 * pad, w + 2 * pad), self.planes.dtype)
+        by_phase = {self.phases[color]: self.planes[k] for k, color in enumerate(COLORS)}
+        rows = np.arange(h + 2 * pad)
+        cols = np.arange(w + 2 * pad)
+        borders = [(rows[:pad], cols), (rows[pad + h:], cols),
+                   (rows[pad:pad + h], cols[:pad]), (rows[pad:pad + h], cols[pad + w:])]
+        for k, color in enumerate(COLORS):
+            py, px = self.phases[color]
+            out[k, pad:pad + h, pad:pad + w] = self.planes[k]
+            qy, iy = source_index(h, py, pad, mode)
+            qx, ix = source_index(w, px, pad, mode)
+            for border_rows, border_cols in borders:
+                for sy in range(2):
+                    r = border_rows[qy[border_rows] == sy]
+                    for sx in range(2):
+                        c = border_cols[qx[border_cols] == sx]
+                        if len(r) and len(c):
+                            out[k][np.ix_(r, c)] = by_phase[(sy, sx)][np.ix_(iy[r], ix[c])]
+        return out
+
+    # ndarray-like attributes used by Pipeline, StageCache and BufferPool
+
+    @property
+    def dtype(self):
+        return self.planes.dtype
+
+    @property
+    def shape(self):
+        return self.planes.shape
+
+    @property
+    def nbytes(self):
+        return self.planes.nbytes
+
+    @property
+    def base(self):
+        return self.planes.base
+
+    def setflags(self, **flags):
+        self.planes.setflags(**flags)
+
+
+def as_planes(img, bayer_pattern):
+    'img itself when already split, else the planes of the mosaic'
+    return img if isinstance(img, BayerPlanes) else BayerPlanes.split(img, bayer_pattern)
+
+
+def planes_out(out, planes, dtype):
+    'output planes of a stage: the pooled out when it holds planes, else new ones'
+    return out if isinstance(out, BayerPlanes) else planes.empty(dtype)
+
+
+def as_input(planes, img, out=None):
+    'a stage result in the form of its input: planes for planes, a mosaic (into out) for a mosaic'
+    return planes if isinstance(img, BayerPlanes) else planes.mosaic(out)
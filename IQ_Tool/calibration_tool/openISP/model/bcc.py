@@ -14,11 +14,15 @@ class BCC:
         np.clip(self.img, 0, self.clip, out=self.img)
         return self.img
 
-    def execute(self):
+    def execute(self, out=None):
         img_h = self.img.shape[0]
         img_w = self.img.shape[1]
-        bcc_img = np.empty((img_h, img_w), np.int16)
-        bcc_img = self.img + self.brightness
-        bcc_img = bcc_img + (self.img - 127) * self.contrast
+        if out is None:
+            bcc_img = self.img + self.brightness
+            bcc_img = bcc_img + (self.img - 127) * self.contrast
+        else:
+            bcc_img = out
+            np.add(self.img, self.brightness, out=bcc_img)
+            np.add(bcc_img, (self.img - 127) * self.contrast, out=bcc_img, casting='unsafe')
         self.img = bcc_img
         return self.clipping()
@@ -1,5 +1,6 @@
 #!/usr/bin/python
 import numpy as np
+from model.bayer import as_input, as_planes, planes_out
 
 class BLC:
     'Black Level Compensation'
@@ -11,55 +12,24 @@ class BLC:
         self.clip = clip
 
     def clipping(self):
-        np.clip(self.img, 0, self.clip, out=self.img)
+        np.clip(self.img.planes, 0, self.clip, out=self.img.planes)
         return self.img
 
-    def execute(self):
+    def execute(self, out=None):
         bl_r = self.parameter[0]
         bl_gr = self.parameter[1]
         bl_gb = self.parameter[2]
         bl_b = self.parameter[3]
         alpha = self.parameter[4]
         beta = self.parameter[5]
-        raw_h = self.img.shape[0]
-        raw_w = self.img.shape[1]
-        blc_img = np.empty((raw_h,raw_w), np.int16)
-        if self.bayer_pattern == 'rggb':
-            r = self.img[::2, ::2] + bl_r
-            b = self.img[1::2, 1::2] + bl_b
-            gr = self.img[::2, 1::2] + bl_gr + alpha * r / 256
-            gb = self.img[1::2, ::2] + bl_gb + beta * b / 256
-            blc_img[::2, ::2] = r
-            blc_img[::2, 1::2] = gr
-            blc_img[1::2, ::2] = gb
-            blc_img[1::2, 1::2] = b
-        elif self.bayer_pattern == 'bggr':
-            b = self.img[::2, ::2] + bl_b
-            r = self.img[1::2, 1::2] + bl_r
-            gb = self.img[::2, 1::2] + bl_gb + beta * b / 256
-            gr = self.img[1::2, ::2] + bl_gr + alpha * r / 256
-            blc_img[::2, ::2] = b
-            blc_img[::2, 1::2] = gb
-            blc_img[1::2, ::2] = gr
-            blc_img[1::2, 1::2] = r
-        elif self.bayer_pattern == 'gbrg':
-            b = self.img[::2, 1::2] + bl_b
-            r = self.img[1::2, ::2] + bl_r
-            gb = self.img[::2, ::2] + bl_gb + beta * b / 256
-            gr = self.img[1::2, 1::2] + bl_gr + alpha * r / 256
-            blc_img[::2, ::2] = gb
-            blc_img[::2, 1::2] = b
-            blc_img[1::2, ::2] = r
-            blc_img[1::2, 1::2] = gr
-        elif self.bayer_pattern == 'grbg':
-            r = self.img[::2, 1::2] + bl_r
-            b = self.img[1::2, ::2] + bl_b
-            gr = self.img[::2, ::2] + bl_gr + alpha * r / 256
-            gb = self.img[1::2, 1::2] + bl_gb + beta * b / 256
-            blc_img[::2, ::2] = gr
-            blc_img[::2, 1::2] = r
-            blc_img[1::2, ::2] = b
-            blc_img[1::2, 1::2] = gb
+        planes = as_planes(self.img, self.bayer_pattern)
+        blc_img = planes_out(out, planes, np.int16)
+        r = planes['r'] + bl_r
+        b = planes['b'] + bl_b
+        blc_img['r'][:] = r
+        blc_img['gr'][:] = planes['gr'] + bl_gr + alpha * r / 256
+        blc_img['gb'][:] = planes['gb'] + bl_gb + beta * b / 256
+        blc_img['b'][:] = b
+        img = self.img
         self.img = blc_img
-        return self.clipping()
-
+        return as_input(self.clipping(), img, out)
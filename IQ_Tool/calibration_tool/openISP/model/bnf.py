@@ -4,12 +4,14 @@ import numpy as np
 class BNF:
     'Bilateral Noise Filtering'
 
-    def __init__(self, img, dw, rw, rthres, clip):
+    def __init__(self, img, dw, rw, rthres, clip, vectorized=True, tile_rows=64):
         self.img = img
         self.dw = dw
         self.rw = rw
         self.rthres = rthres
         self.clip = clip
+        self.vectorized = vectorized
+        self.tile_rows = tile_rows  # rows per stripe in the vectorized engine, None for the whole frame
 
     def padding(self):
         img_pad = np.pad(self.img, (2, 2), 'reflect')
@@ -19,16 +21,58 @@ class BNF:
         np.clip(self.img, 0, self.clip, out=self.img)
         return self.img
 
-    def execute(self):
+    def rwLut(self):
+        'radiometric weight for every possible |diff|, same ladder as the per-pixel code'
+        rdiff = np.arange(65536)
+        rw = np.select([rdiff >= self.rthres[0],
+                        (rdiff < self.rthres[0]) & (rdiff >= self.rthres[1]),
+                        (rdiff < self.rthres[1]) & (rdiff >= self.rthres[2]),
+                        rdiff < self.rthres[2]],
+                       [self.rw[0], self.rw[1], self.rw[2], self.rw[3]],
+                       rdiff)
+        return rw.astype(np.uint16)
+
+    def filterStripe(self, stripe_pad, lut, dw):
+        'bilateral filter of one padded stripe (2 rows/cols of halo on each side)'
+        h = stripe_pad.shape[0] - 4
+        w = stripe_pad.shape[1] - 4
+        center = stripe_pad[2:2 + h, 2:2 + w]
+        windows = np.stack([stripe_pad[i:i + h, j:j + w] for i in range(5) for j in range(5)])
+        weights = lut[np.abs(windows - center)] * dw[:, None, None]
+        return np.sum(windows * weights, axis=0) / np.sum(weights, axis=0)
+
+    def execute_vectorized(self, out=None):
+        """
+        Builds the 25 shifted range-difference planes, maps them to rw through a look up table,
+        multiplies by dw and normalizes, stripe by stripe so the working set stays bounded.
+        """
+        img_pad = self.padding()
+        img_pad = img_pad.astype(np.uint16)
+        raw_h = self.img.shape[0]
+        raw_w = self.img.shape[1]
+        lut = self.rwLut()
+        dw = np.asarray(self.dw).reshape(25)
+        tile_rows = raw_h if self.tile_rows is None else self.tile_rows
+        bnf_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for y in range(0, raw_h, tile_rows):
+                rows = min(tile_rows, raw_h - y)
+                stripe_pad = img_pad[y:y + rows + 4, :].astype(np.int32)
+                bnf_img[y:y + rows, :] = self.filterStripe(stripe_pad, lut, dw)
+        self.img = bnf_img
+        return self.clipping()
+
+    def execute(self, out=None):
+        if self.vectorized:
+            return self.execute_vectorized(out)
         img_pad = self.padding()
         img_pad = img_pad.astype(np.uint16)
         raw_h = self.img.shape[0]
         raw_w = self.img.shape[1]
-        bnf_img = np.empty((raw_h, raw_w), np.uint16)
+        bnf_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
         rdiff = np.zeros((5,5), dtype='uint16')
         for y in range(img_pad.shape[0] - 4):
             for x in range(img_pad.shape[1] - 4):
-                print("[x,y]:["+str(x)+','+str(y)+']')
                 for i in range(5):
                     for j in range(5):
                         rdiff[i,j] = abs(img_pad[y+i,x+j].astype(int) - img_pad[y+2, x+2].astype(int))
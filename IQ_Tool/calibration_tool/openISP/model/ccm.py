@@ -1,24 +1,16 @@
 #!/usr/bin/python
-import numpy as np
+from model.color_matrix import apply_color_matrix
 
 class CCM:
     'Color Correction Matrix'
 
-    def __init__(self, img, ccm):
+    def __init__(self, img, ccm, clip=255, out=None):
         self.img = img
         self.ccm = ccm
+        self.clip = clip
+        self.out = out
 
-    def execute(self):
-        img_h = self.img.shape[0]
-        img_w = self.img.shape[1]
-        img_c = self.img.shape[2]
-        ccm_img = np.empty((img_h, img_w, img_c), np.uint32)
-        for y in range(img_h):
-            for x in range(img_w):
-                mulval = self.ccm[:,0:3] * self.img[y,x,:]
-                ccm_img[y,x,0] = np.sum(mulval[0]) + self.ccm[0,3]
-                ccm_img[y,x,1] = np.sum(mulval[1]) + self.ccm[1,3]
-                ccm_img[y,x,2] = np.sum(mulval[2]) + self.ccm[2,3]
-                ccm_img[y,x,:] = ccm_img[y,x,:] / 1024
-        self.img = ccm_img.astype(np.uint8)
+    def execute(self, out=None):
+        out = self.out if out is None else out
+        self.img = apply_color_matrix(self.img, self.ccm, self.clip, out=out)
         return self.img
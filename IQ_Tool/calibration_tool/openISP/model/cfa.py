@@ -1,14 +1,39 @@
 #!/usr/bin/python
 import numpy as np
+from scipy.ndimage import correlate
+from model.bayer import BAYER_PHASES, BayerPlanes
+
+# Malvar-He-Cutler 5x5 kernels (scaled by 8), same coefficients as CFA.malvar
+# G at R/B sites
+MALVAR_G_AT_RB = np.array([[ 0,  0, -1,  0,  0],
+                           [ 0,  0,  2,  0,  0],
+                           [-1,  2,  4,  2, -1],
+                           [ 0,  0,  2,  0,  0],
+                           [ 0,  0, -1,  0,  0]], dtype=np.float64)
+# R at B sites / B at R sites
+MALVAR_RB_AT_BR = np.array([[   0,  0, -1.5,  0,    0],
+                            [   0,  2,    0,  2,    0],
+                            [-1.5,  0,    6,  0, -1.5],
+                            [   0,  2,    0,  2,    0],
+                            [   0,  0, -1.5,  0,    0]], dtype=np.float64)
+# R/B at G sites whose horizontal neighbours carry that color
+MALVAR_RB_AT_G_ROW = np.array([[ 0,  0, 0.5,  0,  0],
+                               [ 0, -1,   0, -1,  0],
+                               [-1,  4,   5,  4, -1],
+                               [ 0, -1,   0, -1,  0],
+                               [ 0,  0, 0.5,  0,  0]], dtype=np.float64)
+# R/B at G sites whose vertical neighbours carry that color
+MALVAR_RB_AT_G_COL = MALVAR_RB_AT_G_ROW.T.copy()
 
 class CFA:
     'Color Filter Array Interpolation'
 
-    def __init__(self, img, mode, bayer_pattern, clip):
+    def __init__(self, img, mode, bayer_pattern, clip, vectorized=True):
         self.img = img
         self.mode = mode
         self.bayer_pattern = bayer_pattern
         self.clip = clip
+        self.vectorized = vectorized
 
     def padding(self):
         img_pad = np.pad(self.img, ((2, 2), (2, 2)), 'reflect')
@@ -53,53 +78,50 @@ class CFA:
             g = g / 8
         return [r, g, b]
 
-    def execute(self):
+    def malvar_vectorized(self, img_pad, out=None):
+        'Malvar-He-Cutler on the whole frame: four 5x5 correlations, picked per Bayer phase'
+        raw_h = self.img.shape[0]
+        raw_w = self.img.shape[1]
+        img_pad = img_pad.astype(np.float64)
+
+        def filtered(kernel):
+            return correlate(img_pad, kernel)[2:2 + raw_h, 2:2 + raw_w] / 8
+
+        center = img_pad[2:2 + raw_h, 2:2 + raw_w]
+        g_at_rb = filtered(MALVAR_G_AT_RB)
+        rb_at_br = filtered(MALVAR_RB_AT_BR)
+        rb_at_g_row = filtered(MALVAR_RB_AT_G_ROW)
+        rb_at_g_col = filtered(MALVAR_RB_AT_G_COL)
+
+        # [r, g, b] sources for each color site, mirrors the branches of CFA.malvar
+        sources = {
+            'r': (center, g_at_rb, rb_at_br),
+            'gr': (rb_at_g_row, center, rb_at_g_col),
+            'gb': (rb_at_g_col, center, rb_at_g_row),
+            'b': (rb_at_br, g_at_rb, center),
+        }
+        cfa_img = np.empty((raw_h, raw_w, 3), np.int16) if out is None else out
+        for is_color, (py, px) in BAYER_PHASES[self.bayer_pattern].items():
+            for c, plane in enumerate(sources[is_color]):
+                cfa_img[py::2, px::2, c] = plane[py::2, px::2]
+        return cfa_img
+
+    def execute(self, out=None):
+        if isinstance(self.img, BayerPlanes):
+            # RAW stages hand over Bayer planes, demosaicing works on the mosaic
+            self.img = self.img.mosaic()
+        if self.vectorized and self.mode == 'malvar':
+            self.img = self.malvar_vectorized(self.padding(), out)
+            return self.clipping()
         img_pad = self.padding()
         img_pad = img_pad.astype(np.int32)
         raw_h = self.img.shape[0]
         raw_w = self.img.shape[1]
-        cfa_img = np.empty((raw_h, raw_w, 3), np.int16)
+        cfa_img = np.empty((raw_h, raw_w, 3), np.int16) if out is None else out
         for y in range(0, img_pad.shape[0]-4-1, 2):
             for x in range(0, img_pad.shape[1]-4-1, 2):
-                if self.bayer_pattern == 'rggb':
-                    r = img_pad[y+2,x+2]
-                    gr = img_pad[y+2,x+3]
-                    gb = img_pad[y+3,x+2]
-                    b = img_pad[y+3,x+3]
-                    if self.mode == 'malvar':
-                        cfa_img[y,x,:] = self.malvar('r', r, y+2,x+2, img_pad)
-                        cfa_img[y,x+1,:] = self.malvar('gr', gr, y+2,x+3, img_pad)
-                        cfa_img[y+1,x,:] = self.malvar('gb', gb, y+3,x+2, img_pad)
-                        cfa_img[y+1,x+1,:] = self.malvar('b', b, y+3,x+3, img_pad)
-                elif self.bayer_pattern == 'bggr':
-                    b = img_pad[y+2,x+2]
-                    gb = img_pad[y+2,x+3]
-                    gr = img_pad[y+3,x+2]
-                    r = img_pad[y+3,x+3]
-                    if self.mode == 'malvar':
-                        cfa_img[y,x,:] = self.malvar('b', b, y+2,x+2, img_pad)
-                        cfa_img[y,x+1,:] = self.malvar('gb', gb, y+2,x+3, img_pad)
-                        cfa_img[y+1,x,:] = self.malvar('gr', gr, y+3,x+2, img_pad)
-                        cfa_img[y+1,x+1,:] = self.malvar('r', r, y+3,x+3, img_pad)
-                elif self.bayer_pattern == 'gbrg':
-                    gb = img_pad[y+2,x+2]
-                    b = img_pad[y+2,x+3]
-                    r = img_pad[y+3,x+2]
-                    gr = img_pad[y+3,x+3]
-                    if self.mode == 'malvar':
-                        cfa_img[y,x,:] = self.malvar('gb', gb, y+2,x+2, img_pad)
-                        cfa_img[y,x+1,:] = self.malvar('b', b, y+2,x+3, img_pad)
-                        cfa_img[y+1,x,:] = self.malvar('r', r, y+3,x+2, img_pad)
-                        cfa_img[y+1,x+1,:] = self.malvar('gr', gr, y+3,x+3, img_pad)
-                elif self.bayer_pattern == 'grbg':
-                    gr = img_pad[y+2,x+2]
-                    r = img_pad[y+2,x+3]
-                    b = img_pad[y+3,x+2]
-                    gb = img_pad[y+3,x+3]
+                for is_color, (py, px) in BAYER_PHASES[self.bayer_pattern].items():
                     if self.mode == 'malvar':
-                        cfa_img[y,x,:] = self.malvar('gr', gr, y+2,x+2, img_pad)
-                        cfa_img[y,x+1,:] = self.malvar('r', r, y+2,x+3, img_pad)
-                        cfa_img[y+1,x,:] = self.malvar('b', b, y+3,x+2, img_pad)
-                        cfa_img[y+1,x+1,:] = self.malvar('gb', gb, y+3,x+3, img_pad)
+                        cfa_img[y+py,x+px,:] = self.malvar(is_color, img_pad[y+2+py,x+2+px], y+2+py,x+2+px, img_pad)
         self.img = cfa_img
-        return self.clipping()
\ No newline at end of file
+        return self.clipping()
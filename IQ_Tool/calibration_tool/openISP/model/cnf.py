@@ -1,22 +1,84 @@
 #!/usr/bin/python
 import numpy as np
+from model.backend import jit, kernel, register
+from model.bayer import BAYER_PHASES, COLORS, BayerPlanes, as_input, as_planes, planes_out
+
+# fade ladders of CNF.cnc: value i applies to bins[i-1] < x <= bins[i]
+FADE1_BINS = np.array([30, 50, 70, 100, 150, 200, 250])
+FADE1_VALUES = np.array([1.0, 0.9, 0.8, 0.7, 0.6, 0.3, 0.1, 0])
+FADE2_BINS = np.array([30, 50, 70, 100, 150, 200])
+FADE2_VALUES = np.array([1.0, 0.9, 0.8, 0.6, 0.5, 0.3, 0])
+DAMP_BINS = [1.0, 1.2]
+DAMP_VALUES = [1.0, 0.5, 0.3]
+
+
+@register('cnf', 'numpy')
+def cnf_numpy(center, avgG, avgC1, avgC2, thres, dampFactor, red, out):
+    'Chroma noise detection and correction on whole planes, fade ladders through np.digitize'
+    is_noise = (center > avgG + thres) & (center > avgC2 + thres) \
+        & (avgC1 > avgG + thres) & (avgC1 > avgC2 + thres)
+    if red:
+        signalMeter = 0.299 * avgC1 + 0.587 * avgG + 0.114 * avgC2
+    else:
+        signalMeter = 0.299 * avgC2 + 0.587 * avgG + 0.114 * avgC1
+    avgMax = np.maximum(avgG, avgC2)
+    signalGap = center - avgMax
+    chromaCorrected = avgMax + dampFactor * signalGap
+    fade1 = FADE1_VALUES[np.digitize(signalMeter, FADE1_BINS, right=True)]
+    fade2 = FADE2_VALUES[np.digitize(avgC1, FADE2_BINS, right=True)]
+    fadeTot = fade1 * fade2
+    corrected = (1 - fadeTot) * center + fadeTot * chromaCorrected
+    out[is_noise] = corrected[is_noise]
+
+
+@jit
+def fade_numba(x, bins, values):
+    i = 0
+    while i < len(bins) and x > bins[i]:
+        i += 1
+    return values[i]
+
+
+@register('cnf', 'numba')
+@jit
+def cnf_numba(center, avgG, avgC1, avgC2, thres, dampFactor, red, out):
+    'per-pixel form of cnf_numpy: only noisy pixels walk the fade ladders'
+    for y in range(out.shape[0]):
+        for x in range(out.shape[1]):
+            c = center[y, x]
+            g = avgG[y, x]
+            c1 = avgC1[y, x]
+            c2 = avgC2[y, x]
+            if not (c > g + thres and c > c2 + thres and c1 > g + thres and c1 > c2 + thres):
+                continue
+            if red:
+                signalMeter = 0.299 * c1 + 0.587 * g + 0.114 * c2
+            else:
+                signalMeter = 0.299 * c2 + 0.587 * g + 0.114 * c1
+            avgMax = max(g, c2)
+            chromaCorrected = avgMax + dampFactor * (c - avgMax)
+            fadeTot = fade_numba(signalMeter, FADE1_BINS, FADE1_VALUES) * fade_numba(c1, FADE2_BINS, FADE2_VALUES)
+            out[y, x] = (1 - fadeTot) * c + fadeTot * chromaCorrected
+
 
 class CNF:
     'Chroma Noise Filtering'
 
-    def __init__(self, img, bayer_pattern, thres, gain, clip):
+    def __init__(self, img, bayer_pattern, thres, gain, clip, vectorized=True):
         self.img = img
         self.bayer_pattern = bayer_pattern
         self.thres = thres
         self.gain = gain
         self.clip = clip
+        self.vectorized = vectorized
 
     def padding(self):
         img_pad = np.pad(self.img, ((4, 4), (4, 4)), 'reflect')
         return img_pad
 
     def clipping(self):
-        np.clip(self.img, 0, self.clip, out=self.img)
+        img = self.img.planes if isinstance(self.img, BayerPlanes) else self.img
+        np.clip(img, 0, self.clip, out=img)
         return self.img
 
     def cnc(self, is_color, center, avgG, avgC1, avgC2):
@@ -117,48 +179,68 @@ class CNF:
             pix_out = img[y,x]
         return pix_out
 
-    def execute(self):
+    def boxSums(self, img_pad):
+        'sum of every 4x4 block of each padded Bayer plane'
+        planes = img_pad.astype(np.int64)
+        rows = planes[:, 0:-3] + planes[:, 1:-2] + planes[:, 2:-1] + planes[:, 3:]
+        return rows[:, :, 0:-3] + rows[:, :, 1:-2] + rows[:, :, 2:-1] + rows[:, :, 3:]
+
+    def execute_vectorized(self, out=None):
+        """
+        Same detection/correction as cnd/cnc for every R and B pixel at once, the
+        kernel comes from the model.backend registry.
+
+        The 8x8 window of cnd starts 4 pixels up/left of the centre, so on each Bayer
+        plane it is a 4x4 block: one box sum per plane, sampled with an offset that depends
+        on the centre and plane phases, gives avgG/avgC1/avgC2 for the whole frame. As in
+        cnd, G/C1/C2 are the mosaic phases (0,1)+(1,0), (0,0) and (1,1).
+        """
+        planes = as_planes(self.img, self.bayer_pattern)
+        sums = self.boxSums(planes.padded(2))
+        by_phase = {planes.phases[color]: sums[k] for k, color in enumerate(COLORS)}
+        plane_h = planes.shape[1]
+        plane_w = planes.shape[2]
+        cnf_img = planes_out(out, planes, np.uint16)
+        cnf_img.planes[:] = planes.planes
+        for is_color in ('r', 'b'):
+            cy, cx = planes.phases[is_color]
+
+            def window_sum(py, px):
+                # the window starts one plane row/col later for an odd centre on an even plane
+                oy = 1 if cy == 1 and py == 0 else 0
+                ox = 1 if cx == 1 and px == 0 else 0
+                return by_phase[(py, px)][oy:oy + plane_h, ox:ox + plane_w]
+
+            avgG = (window_sum(1, 0) + window_sum(0, 1)) / 40
+            avgC1 = window_sum(0, 0) / 25
+            avgC2 = window_sum(1, 1) / 16
+            center = planes[is_color].astype(np.float64)
+            gain = self.gain[0] if is_color == 'r' else self.gain[3]
+            dampFactor = DAMP_VALUES[np.digitize(gain, DAMP_BINS, right=True)]
+            kernel('cnf')(center, avgG, avgC1, avgC2, self.thres, dampFactor, is_color == 'r', cnf_img[is_color])
+        img = self.img
+        self.img = cnf_img
+        self.clipping()
+        return as_input(cnf_img, img, out)
+
+    def execute(self, out=None):
+        if self.vectorized:
+            return self.execute_vectorized(out)
+        if isinstance(self.img, BayerPlanes):
+            # the per-pixel reference works on the mosaic
+            planes = self.img
+            self.img = planes.mosaic()
+            return BayerPlanes.split(self.execute(), planes.bayer_pattern, out)
         img_pad = self.padding()
         raw_h = self.img.shape[0]
         raw_w = self.img.shape[1]
-        cnf_img = np.empty((raw_h, raw_w), np.uint16)
+        cnf_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
         for y in range(0, img_pad.shape[0] - 8 - 1, 2):
             for x in range(0, img_pad.shape[1] - 8 - 1, 2):
-                if self.bayer_pattern == 'rggb':
-                    r = img_pad[y + 4, x + 4]
-                    gr = img_pad[y + 4, x + 5]
-                    gb = img_pad[y + 5, x + 4]
-                    b = img_pad[y + 5, x + 5]
-                    cnf_img[y, x] = self.cnf('r', y + 4, x + 4, img_pad)
-                    cnf_img[y, x + 1] = gr
-                    cnf_img[y + 1, x] = gb
-                    cnf_img[y + 1, x + 1] = self.cnf('b', y + 5, x + 5, img_pad)
-                elif self.bayer_pattern == 'bggr':
-                    b = img_pad[y + 4, x + 4]
-                    gb = img_pad[y + 4, x + 5]
-                    gr = img_pad[y + 5, x + 4]
-                    r = img_pad[y + 5, x + 5]
-                    cnf_img[y, x] = self.cnf('b', y + 4, x + 4, img_pad)
-                    cnf_img[y, x + 1] = gb
-                    cnf_img[y + 1, x] = gr
-                    cnf_img[y + 1, x + 1] = self.cnf('r', y + 5, x + 5, img_pad)
-                elif self.bayer_pattern == 'gbrg':
-                    gb = img_pad[y + 4, x + 4]
-                    b = img_pad[y + 4, x + 5]
-                    r = img_pad[y + 5, x + 4]
-                    gr = img_pad[y + 5, x + 5]
-                    cnf_img[y, x] = gb
-                    cnf_img[y, x + 1] = self.cnf('b', y + 4, x + 5, img_pad)
-                    cnf_img[y + 1, x] = self.cnf('r', y + 5, x + 4, img_pad)
-                    cnf_img[y + 1, x + 1] = gr
-                elif self.bayer_pattern == 'grbg':
-                    gr = img_pad[y + 4, x + 4]
-                    r = img_pad[y + 4, x + 5]
-                    b = img_pad[y + 5, x + 2]
-                    gb = img_pad[y + 5, x + 5]
-                    cnf_img[y, x, :] = gr
-                    cnf_img[y, x + 1, :] = self.cnf('r', y + 4, x + 5, img_pad)
-                    cnf_img[y + 1, x, :] = self.cnf('b', y + 5, x + 4, img_pad)
-                    cnf_img[y + 1, x + 1, :] = gb
+                for is_color, (py, px) in BAYER_PHASES[self.bayer_pattern].items():
+                    if is_color in ('r', 'b'):
+                        cnf_img[y + py, x + px] = self.cnf(is_color, y + 4 + py, x + 4 + px, img_pad)
+                    else:
+                        cnf_img[y + py, x + px] = img_pad[y + 4 + py, x + 4 + px]
         self.img = cnf_img
         return self.clipping()
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+import numpy as np
+
+# 3x4 color matrices are stored in fixed point: coefficients and offsets scaled by 1024
+MATRIX_SCALE = 1024
+
+
+def apply_color_matrix(img, matrix, clip, out=None, dtype=np.uint8):
+    """
+    Apply a 3x4 fixed-point color matrix to an (H, W, 3) image.
+
+    One matmul over the (H*W, 3) view, offset, /1024 shift, then saturation to [0, clip]
+    (no unsigned wrap of negative or overflowing results). The result is written into
+    out when given, otherwise into a new array of the given dtype.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    img_h = img.shape[0]
+    img_w = img.shape[1]
+    img_c = img.shape[2]
+    if out is None:
+        out = np.empty((img_h, img_w, img_c), dtype)
+    pixels = img.reshape(img_h * img_w, img_c)
+    acc = np.matmul(pixels, matrix[:, 0:3].T)
+    acc += matrix[:, 3]
+    np.floor_divide(acc, MATRIX_SCALE, out=acc)
+    np.clip(acc, 0, clip, out=acc)
+    out[...] = acc.reshape(img_h, img_w, img_c)
+    return out
+
+
+def fuse_color_matrix(first, second):
+    """
+    Fixed-point 3x4 matrix equivalent to applying first, then second.
+
+    Only valid when nothing non-linear (e.g. gamma) runs in between; the intermediate
+    rounding and saturation of the two-step path are skipped.
+    """
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    fused = np.empty((3, 4))
+    fused[:, 0:3] = np.matmul(second[:, 0:3], first[:, 0:3]) / MATRIX_SCALE
+    fused[:, 3] = np.matmul(second[:, 0:3], first[:, 3]) / MATRIX_SCALE + second[:, 3]
+    return fused
+
+
+def invert_color_matrix(matrix):
+    """
+    Fixed-point 3x4 matrix undoing matrix, e.g. YUV -> RGB from the CSC coefficients.
+
+    The offset carries half a step so the /1024 floor of apply_color_matrix rounds.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    inverse = np.linalg.inv(matrix[:, 0:3] / MATRIX_SCALE)
+    inverted = np.empty((3, 4))
+    inverted[:, 0:3] = inverse * MATRIX_SCALE
+    inverted[:, 3] = -np.matmul(inverse, matrix[:, 3]) + MATRIX_SCALE // 2
+    return inverted
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+import csv
+import json
+import os
+import numpy as np
+from collections import OrderedDict
+
+BAYER_PATTERNS = ('rggb', 'bggr', 'gbrg', 'grbg')
+
+
+class Param:
+    'One config entry: scalar, or a vector/matrix stored as name_i / name_ij rows in config.csv'
+
+    def __init__(self, name, type, default, shape=(), range=None, choices=None, description=''):
+        self.name = name
+        self.type = type            # int, float or str
+        self.shape = shape          # () for scalars, (n,) or (rows, cols) for name_i / name_ij rows
+        self.default = np.array(default, dtype=object).reshape(shape) if shape else default
+        self.range = range          # (min, max) inclusive, None for unbounded
+        self.choices = choices      # allowed values of str entries
+        self.description = description
+
+    def elements(self):
+        'csv row name and index of every element, (name, ()) for scalars'
+        if not self.shape:
+            return [(self.name, ())]
+        if len(self.shape) == 1:
+            return [(f'{self.name}_{i}', (i,)) for i in range(self.shape[0])]
+        return [(f'{self.name}_{r}{c}', (r, c)) for r in range(self.shape[0]) for c in range(self.shape[1])]
+
+    def convert(self, value, row_name):
+        'typed and validated element value, ValueError naming the csv row otherwise'
+        try:
+            value = self.type(float(value)) if self.type is int else self.type(value)
+        except ValueError:
+            raise ValueError(f'{row_name}: {value!r} is not a valid {self.type.__name__}')
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f'{row_name}: {value!r} is not one of {self.choices}')
+        if self.range is not None and not self.range[0] <= value <= self.range[1]:
+            raise ValueError(f'{row_name}: {value} is outside {self.range}')
+        return value
+
+
+CLIP = (0, 65535)
+
+SCHEMA = OrderedDict((param.name, param) for param in [
+    Param('raw_w', int, 3264, range=(2, 65536), description='Raw image width'),
+    Param('raw_h', int, 2448, range=(2, 65536), description='Raw image height'),
+    Param('dpc_thres', int, 30, range=(0, 65535), description='DPC threshold'),
+    Param('dpc_mode', str, 'gradient', choices=('gradient', 'mean'), description='DPC mode'),
+    Param('dpc_clip', int, 1023, range=CLIP, description='DPC clip value'),
+    Param('bayer_pattern', str, 'rggb', choices=BAYER_PATTERNS, description='Bayer pattern'),
+    Param('bl_r', int, 0, description='Black level offset of Red channel'),
+    Param('bl_gr', int, 0, description='Black level offset of Green(R) channel'),
+    Param('bl_gb', int, 0, description='Black level offset of Green(B) channel'),
+    Param('bl_b', int, 0, description='Black level offset of Blue channel'),
+    Param('alpha', int, 0, description='Fusion parameter for Red channel'),
+    Param('beta', int, 0, description='Fusion parameter for Blue channel'),
+    Param('blc_clip', int, 1023, range=CLIP, description='BLC clip value'),
+    Param('lsc_table', str, '', description='Lens shading gain grid csv, empty for no correction'),
+    Param('lsc_clip', int, 1023, range=CLIP, description='LSC clip value'),
+    Param('r_gain', float, 1.5, range=(0, 16), description='AWB Red gain'),
+    Param('gr_gain', float, 1.0, range=(0, 16), description='AWB Green(R) gain'),
+    Param('gb_gain', float, 1.0, range=(0, 16), description='AWB Green(B) gain'),
+    Param('b_gain', float, 1.1, range=(0, 16), description='AWB Blue gain'),
+    Param('awb_clip', int, 1023, range=CLIP, description='AWB clip value'),
+    Param('cfa_mode', str, 'malvar', choices=('malvar',), description='Demosaic mode'),
+    Param('cfa_clip', int, 1023, range=CLIP, description='CFA clip value'),
+    Param('ccm', int, [[1024, 0, 0, 0], [0, 1024, 0, 0], [0, 0, 1024, 0]], (3, 4),
+          description='CCM, x1024 coefficients and offset column'),
+    Param('csc', float, [[0.257, 0.504, 0.098, 16], [-0.148, -0.291, 0.439, 128], [0.439, -0.368, -0.071, 128]],
+          (3, 4), description='CSC coefficients and offset column'),
+    Param('bnf_dw', int, [[8, 12, 32, 12, 8], [12, 64, 128, 64, 12], [32, 128, 1024, 128, 32],
+                          [12, 64, 128, 64, 12], [8, 12, 32, 12, 8]], (5, 5), range=(0, 65535),
+          description='BNF distance weights'),
+    Param('bnf_rw', int, [0, 8, 16, 32], (4,), range=(0, 65535), description='BNF radiometric diff'),
+    Param('bnf_rthres', int, [128, 32, 8], (3,), range=(0, 65535), description='BNF diff threshold'),
+    Param('bnf_clip', int, 255, range=CLIP, description='BNF clip value'),
+    Param('edge_filter', int, [[-1, 0, -1, 0, -1], [-1, 0, 8, 0, -1], [-1, 0, -1, 0, -1]], (3, 5),
+          description='Edge filter'),
+    Param('ee_gain_min', int, 32, range=(0, 65535), description='Edge enhancement min gain'),
+    Param('ee_gain_max', int, 128, range=(0, 65535), description='Edge enhancement max gain'),
+    Param('ee_thres_min', int, 32, range=(0, 65535), description='Edge enhancement min threshold'),
+    Param('ee_thres_max', int, 64, range=(0, 65535), description='Edge enhancement max threshold'),
+    Param('ee_emclip_min', int, -64, range=(-32768, 32767), description='Edge map min clip value'),
+    Param('ee_emclip_max', int, 64, range=(-32768, 32767), description='Edge map max clip value'),
+    Param('fcs_edge_min', int, 32, range=(0, 65535), description='FCS edge min value'),
+    Param('fcs_edge_max', int, 64, range=(0, 65535), description='FCS edge max value'),
+    Param('fcs_gain', int, 32, description='FCS gain'),
+    Param('fcs_intercept', int, 2, description='FCS intercept'),
+    Param('fcs_slope', int, 3, description='FCS slope'),
+    Param('nlm_h', int, 10, range=(1, 65535), description='NLM sigma'),
+    Param('nlm_clip', int, 255, range=CLIP, description='NLM clip'),
+    Param('hue', int, 128, range=(0, 359), description='Hue value'),
+    Param('saturation', int, 256, description='Saturation gain'),
+    Param('hsc_clip', int, 255, range=CLIP, description='HSC clip value'),
+    Param('brightness', int, 10, range=(-255, 255), description='Brightness'),
+    Param('contrast', int, 10, description='Contast gain'),
+    Param('bcc_clip', int, 255, range=CLIP, description='BCC clip value'),
+])
+
+# csv row name -> (param, element index), built once so each row costs one dict lookup
+ROWS = {row: (param, index) for param in SCHEMA.values() for row, index in param.elements()}
+
+# bump when SCHEMA changes so stale sidecar caches are not reused
+SCHEMA_VERSION = 2
+
+
+class Config:
+    'Typed, validated parameters: scalars as int/float/str, vectors and matrices as ndarrays'
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['values'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def flat(self):
+        'one {csv row name: value} entry per element, the form Pipeline and the GUIs use'
+        parameters = OrderedDict()
+        for param in SCHEMA.values():
+            value = self.values[param.name]
+            for row, index in param.elements():
+                parameters[row] = value[index].item() if index else value
+        return parameters
+
+
+def default_config():
+    values = OrderedDict()
+    for param in SCHEMA.values():
+        values[param.name] = param.default.astype(param.type) if param.shape else param.default
+    return Config(values)
+
+
+def parse_config(config_path):
+    'config.csv -> Config, entries missing from the file keep their schema default'
+    values = default_config().values
+    with open(config_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.reader(f, delimiter=','):
+            if len(row) < 2 or row[0].strip() not in ROWS:
+                continue    # header, blank or unknown rows
+            name = row[0].strip()
+            param, index = ROWS[name]
+            value = param.convert(row[1].strip(), name)
+            if index:
+                values[param.name][index] = value
+            else:
+                values[param.name] = value
+    return Config(values)
+
+
+def sidecar_path(config_path):
+    return config_path + '.cache'
+
+
+def load_config(config_path):
+    """
+    Parsed config, cached as a JSON sidecar next to the csv. The sidecar is reused
+    while the csv mtime/size and the schema version match, so batch runs parse once.
+    Anything unreadable in it (stale, truncated, foreign) just means parsing the csv.
+    """
+    stat = os.stat(config_path)
+    stamp = [SCHEMA_VERSION, stat.st_mtime_ns, stat.st_size]
+    cache_path = sidecar_path(config_path)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['stamp'] == stamp:
+            values = OrderedDict()
+            for param in SCHEMA.values():
+                value = cached['values'][param.name]
+                values[param.name] = np.array(value, dtype=param.type) if param.shape else value
+            return Config(values)
+    except Exception:
+        pass
+    config = parse_config(config_path)
+    try:
+        values = {name: value.tolist() if isinstance(value, np.ndarray) else value
+                  for name, value in config.values.items()}
+        tmp_path = cache_path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stamp': stamp, 'values': values}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass    # read-only config directory, parse again next time
+    return config
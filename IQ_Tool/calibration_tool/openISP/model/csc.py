@@ -1,31 +1,25 @@
 #!/usr/bin/python
-import numpy as np
-from scipy.ndimage import correlate
+from model.color_matrix import apply_color_matrix, fuse_color_matrix, invert_color_matrix
 
 class CSC:
     'Color Space Conversion'
 
-    def __init__(self, img, csc):
+    def __init__(self, img, csc, clip=255, ccm=None, out=None):
         self.img = img
         self.csc = csc
+        self.clip = clip
+        self.ccm = ccm  # fuse CCM into the conversion, only when gamma is skipped
+        self.out = out
 
-    def execute(self):
-        img_h = self.img.shape[0]
-        img_w = self.img.shape[1]
-        img_c = self.img.shape[2]
-        csc_img = np.empty((img_h, img_w, img_c), np.uint32)
-        # for y in range(img_h):
-        #     for x in range(img_w):
-        #         mulval = self.csc[:,0:3] * self.img[y,x,:]
-        #         csc_img[y,x,0] = np.sum(mulval[0]) + self.csc[0,3]
-        #         csc_img[y,x,1] = np.sum(mulval[1]) + self.csc[1,3]
-        #         csc_img[y,x,2] = np.sum(mulval[2]) + self.csc[2,3]
-        #         csc_img[y,x,:] = csc_img[y,x,:] / 1024
+    def execute(self, out=None):
+        csc = self.csc
+        if self.ccm is not None:
+            csc = fuse_color_matrix(self.ccm, self.csc)
+        out = self.out if out is None else out
+        self.img = apply_color_matrix(self.img, csc, self.clip, out=out)
+        return self.img
 
-        csc_img[:, :, 0] = self.img[:, :, 0] * self.csc[0, 0] + self.img[:, :, 1] * self.csc[0, 1] + self.img[:, :, 2] * self.csc[0, 2] + self.csc[0, 3]
-        csc_img[:, :, 1] = self.img[:, :, 0] * self.csc[1, 0] + self.img[:, :, 1] * self.csc[1, 1] + self.img[:, :, 2] * self.csc[1, 2] + self.csc[1, 3]
-        csc_img[:, :, 2] = self.img[:, :, 0] * self.csc[2, 0] + self.img[:, :, 1] * self.csc[2, 1] + self.img[:, :, 2] * self.csc[2, 2] + self.csc[2, 3]
-        csc_img = csc_img / 1024
 
-        self.img = csc_img.astype(np.uint8)
-        return self.img
+def yuv_to_rgb(img, csc, out=None):
+    'uint8 RGB of a pipeline YUV output, the inverse of the csc conversion'
+    return apply_color_matrix(img, invert_color_matrix(csc), 255, out=out)
@@ -1,24 +1,130 @@
 #!/usr/bin/python
 import numpy as np
+from model.backend import jit, kernel, register
+from model.bayer import BayerPlanes, as_input, as_planes, planes_out
+
+# DPC.mode name -> integer code the numpy/numba dpc kernels take
+DPC_MODES = {'mean': 1, 'gradient': 2}
+
+
+@register('dpc', 'numpy')
+def dpc_numpy(img_pad, thres, mode, out):
+    """
+    p1..p8 are the eight same-color neighbours of p0 on the padded planes, every
+    comparison and replacement is done for the whole frame at once.
+    """
+    plane_h = out.shape[1]
+    plane_w = out.shape[2]
+
+    def shifted(dy, dx):
+        return img_pad[:, dy:dy + plane_h, dx:dx + plane_w]
+
+    p0 = shifted(1, 1)
+    p1 = shifted(0, 0)
+    p2 = shifted(0, 1)
+    p3 = shifted(0, 2)
+    p4 = shifted(1, 0)
+    p5 = shifted(1, 2)
+    p6 = shifted(2, 0)
+    p7 = shifted(2, 1)
+    p8 = shifted(2, 2)
+
+    mask = np.ones(out.shape, dtype=bool)
+    for p in (p1, p2, p3, p4, p5, p6, p7, p8):
+        mask &= np.abs(p - p0) > thres
+
+    out[:] = p0
+    if mode == 1:
+        corrected = (p2 + p4 + p5 + p7) // 4
+        out[mask] = corrected[mask]
+    elif mode == 2:
+        dv = np.abs(2 * p0 - p2 - p7)
+        dh = np.abs(2 * p0 - p4 - p5)
+        ddl = np.abs(2 * p0 - p1 - p8)
+        ddr = np.abs(2 * p0 - p3 - p6)
+        dmin = np.minimum(np.minimum(dv, dh), np.minimum(ddl, ddr))
+        # same priority as the if/elif chain: dv, dh, ddl, then ddr
+        corrected = np.select([dmin == dv, dmin == dh, dmin == ddl],
+                              [p2 + p7 + 1, p4 + p5 + 1, p1 + p8 + 1],
+                              p3 + p6 + 1) // 2
+        out[mask] = corrected[mask]
+
+
+@register('dpc', 'numba')
+@jit
+def dpc_numba(img_pad, thres, mode, out):
+    'per-pixel form of dpc_numpy: the gradient direction is a branch, not four full-frame selects'
+    for c in range(out.shape[0]):
+        for y in range(out.shape[1]):
+            for x in range(out.shape[2]):
+                p0 = img_pad[c, y + 1, x + 1]
+                p1 = img_pad[c, y, x]
+                p2 = img_pad[c, y, x + 1]
+                p3 = img_pad[c, y, x + 2]
+                p4 = img_pad[c, y + 1, x]
+                p5 = img_pad[c, y + 1, x + 2]
+                p6 = img_pad[c, y + 2, x]
+                p7 = img_pad[c, y + 2, x + 1]
+                p8 = img_pad[c, y + 2, x + 2]
+                value = p0
+                if mode != 0 and abs(p1 - p0) > thres and abs(p2 - p0) > thres and abs(p3 - p0) > thres \
+                        and abs(p4 - p0) > thres and abs(p5 - p0) > thres and abs(p6 - p0) > thres \
+                        and abs(p7 - p0) > thres and abs(p8 - p0) > thres:
+                    if mode == 1:
+                        value = (p2 + p4 + p5 + p7) // 4
+                    else:
+                        dv = abs(2 * p0 - p2 - p7)
+                        dh = abs(2 * p0 - p4 - p5)
+                        ddl = abs(2 * p0 - p1 - p8)
+                        ddr = abs(2 * p0 - p3 - p6)
+                        dmin = min(min(dv, dh), min(ddl, ddr))
+                        if dmin == dv:
+                            value = (p2 + p7 + 1) // 2
+                        elif dmin == dh:
+                            value = (p4 + p5 + 1) // 2
+                        elif dmin == ddl:
+                            value = (p1 + p8 + 1) // 2
+                        else:
+                            value = (p3 + p6 + 1) // 2
+                out[c, y, x] = value
+
 
 class DPC:
     'Dead Pixel Correction'
 
-    def __init__(self, img, thres, mode, clip):
+    def __init__(self, img, thres, mode, clip, vectorized=True):
         self.img = img
         self.thres = thres
         self.mode = mode
         self.clip = clip
+        self.vectorized = vectorized
 
     def padding(self):
         img_pad = np.pad(self.img, (2, 2), 'reflect')
         return img_pad
 
     def clipping(self):
-        np.clip(self.img, 0, self.clip, out=self.img)
+        img = self.img.planes if isinstance(self.img, BayerPlanes) else self.img
+        np.clip(img, 0, self.clip, out=img)
         return self.img
 
-    def execute(self):
+    def execute_vectorized(self, out=None):
+        """
+        Same algorithm as the per-pixel loop, evaluated on the four Bayer planes at once:
+        offsets 0/2/4 of the padded mosaic are unit-stride offsets 0/1/2 of the padded
+        planes. The kernel comes from the model.backend registry.
+        """
+        # the phase tags do not matter here, every plane is corrected alike
+        planes = as_planes(self.img, 'rggb')
+        img_pad = planes.padded(1).astype(np.int32)
+        dpc_img = planes_out(out, planes, np.uint16)
+        kernel('dpc')(img_pad, self.thres, DPC_MODES.get(self.mode, 0), dpc_img.planes)
+        img = self.img
+        self.img = dpc_img
+        self.clipping()
+        return as_input(dpc_img, img, out)
+
+    def execute(self, out=None):
 
         """
         Pixel array in code is showed above:
@@ -29,12 +135,18 @@ class DPC:
 
         it makes sense for calculating follow-up gradients of pixel values (horizontal,vertical,left/right diagonal).
         """
-
+        if self.vectorized:
+            return self.execute_vectorized(out)
+        if isinstance(self.img, BayerPlanes):
+            # the per-pixel reference works on the mosaic
+            planes = self.img
+            self.img = planes.mosaic()
+            return BayerPlanes.split(self.execute(), planes.bayer_pattern, out)
 
         img_pad = self.padding()
         raw_h = self.img.shape[0]
         raw_w = self.img.shape[1]
-        dpc_img = np.empty((raw_h, raw_w), np.uint16) 
+        dpc_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
         # change uint16 to int_, still exists overflow warning  in the following abs calculation
         for y in range(img_pad.shape[0] - 4):
             for x in range(img_pad.shape[1] - 4):
@@ -1,15 +1,59 @@
 #!/usr/bin/python
 import numpy as np
+from scipy.ndimage import correlate
+from model.backend import jit, kernel, register
+
+
+def emlut_table(thres, gain, emclip):
+    'EE.emlut evaluated for every int16 edge value, index with edge + 32768'
+    val = np.arange(-32768, 32768, dtype=np.int64)
+    lut = np.select([val < -thres[1],
+                     (val < -thres[0]) & (val > -thres[1]),
+                     (val < thres[0]) & (val > -thres[1]),
+                     (val > thres[0]) & (val < thres[1]),
+                     val > thres[1]],
+                    [gain[1] * val, 0, gain[0] * val, 0, gain[1] * val],
+                    0)
+    return np.clip(lut / 256, emclip[0], emclip[1])
+
+
+@register('ee', 'numpy')
+def ee_numpy(center, em_img, thres, gain, emclip, out):
+    'enhanced luma: centre plus the emlut of its edge value, through a 64K-entry table'
+    out[:, :] = center + emlut_table(thres, gain, emclip)[em_img.astype(np.int32) + 32768]
+
+
+@register('ee', 'numba')
+@jit
+def ee_numba(center, em_img, thres, gain, emclip, out):
+    'per-pixel form of ee_numpy: the emlut branches are evaluated per edge value, no table'
+    for y in range(out.shape[0]):
+        for x in range(out.shape[1]):
+            val = np.int64(em_img[y, x])
+            lut = 0
+            if val < -thres[1]:
+                lut = gain[1] * val
+            elif val < -thres[0] and val > -thres[1]:
+                lut = 0
+            elif val < thres[0] and val > -thres[1]:
+                lut = gain[0] * val
+            elif val > thres[0] and val < thres[1]:
+                lut = 0
+            elif val > thres[1]:
+                lut = gain[1] * val
+            out[y, x] = center[y, x] + min(max(lut / 256, emclip[0]), emclip[1])
+
 
 class EE:
     'Edge Enhancement'
 
-    def __init__(self, img, edge_filter, gain, thres, emclip):
+    def __init__(self, img, edge_filter, gain, thres, emclip, vectorized=True):
         self.img = img
         self.edge_filter = edge_filter
         self.gain = gain
         self.thres = thres
         self.emclip = emclip
+        self.vectorized = vectorized
 
     def padding(self):
         img_pad = np.pad(self.img, ((1, 1), (2, 2)), 'reflect')
@@ -35,12 +79,28 @@ class EE:
         lut = max(clip[0], min(lut / 256, clip[1]))
         return lut
 
-    def execute(self):
+    def execute_vectorized(self, out=None, em_out=None):
+        'one correlate pass for the edge map, then the edge-to-enhancement kernel of model.backend'
+        img_pad = self.padding().astype(np.float64)
+        img_h = self.img.shape[0]
+        img_w = self.img.shape[1]
+        edge = correlate(img_pad, np.asarray(self.edge_filter, dtype=np.float64))
+        em_img = np.empty((img_h, img_w), np.int16) if em_out is None else em_out
+        em_img[:, :] = edge[1:1 + img_h, 2:2 + img_w] / 8
+        ee_img = np.empty((img_h, img_w), np.int16) if out is None else out
+        kernel('ee')(img_pad[1:1 + img_h, 2:2 + img_w], em_img, np.asarray(self.thres, np.int64),
+                     np.asarray(self.gain, np.int64), np.asarray(self.emclip, np.float64), ee_img)
+        self.img = ee_img
+        return self.clipping(), em_img
+
+    def execute(self, out=None, em_out=None):
+        if self.vectorized:
+            return self.execute_vectorized(out, em_out)
         img_pad = self.padding()
         img_h = self.img.shape[0]
         img_w = self.img.shape[1]
-        ee_img = np.empty((img_h, img_w), np.int16)
-        em_img = np.empty((img_h, img_w), np.int16)
+        ee_img = np.empty((img_h, img_w), np.int16) if out is None else out
+        em_img = np.empty((img_h, img_w), np.int16) if em_out is None else em_out
         for y in range(img_pad.shape[0] - 2):
             for x in range(img_pad.shape[1] - 4):
                 em_img[y,x] = np.sum(np.multiply(img_pad[y:y+3, x:x+5], self.edge_filter[:, :])) / 8
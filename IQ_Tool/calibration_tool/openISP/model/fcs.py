@@ -4,23 +4,41 @@ import numpy as np
 class FCS:
     'False Color Suppresion'
 
-    def __init__(self, img, edgemap, fcs_edge, gain, intercept, slope):
+    def __init__(self, img, edgemap, fcs_edge, gain, intercept, slope, vectorized=True):
         self.img = img
         self.edgemap = edgemap
         self.fcs_edge = fcs_edge
         self.gain = gain
         self.intercept = intercept
         self.slope = slope
+        self.vectorized = vectorized
 
     def clipping(self):
         np.clip(self.img, 0, 255, out=self.img)
         return self.img
 
-    def execute(self):
+    def execute_vectorized(self, out=None):
+        'piecewise UV gain map for the whole frame, same bands as the per-pixel code'
         img_h = self.img.shape[0]
         img_w = self.img.shape[1]
         img_c = self.img.shape[2]
-        fcs_img = np.empty((img_h, img_w, img_c), np.int16)
+        edgemap = self.edgemap.astype(np.int64)
+        edge = np.abs(edgemap)
+        uvgain = np.select([edge <= self.fcs_edge[0], edge < self.fcs_edge[1]],
+                           [self.gain, self.intercept - self.slope * edgemap],
+                           0)
+        fcs_img = np.empty((img_h, img_w, img_c), np.int16) if out is None else out
+        fcs_img[:, :, :] = uvgain[:, :, None] * self.img.astype(np.float64) / 256 + 128
+        self.img = fcs_img
+        return self.clipping()
+
+    def execute(self, out=None):
+        if self.vectorized:
+            return self.execute_vectorized(out)
+        img_h = self.img.shape[0]
+        img_w = self.img.shape[1]
+        img_c = self.img.shape[2]
+        fcs_img = np.empty((img_h, img_w, img_c), np.int16) if out is None else out
         for y in range(img_h):
             for x in range(img_w):
                 if np.abs(self.edgemap[y,x]) <= self.fcs_edge[0]:
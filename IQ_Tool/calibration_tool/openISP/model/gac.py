@@ -1,5 +1,16 @@
 #!/usr/bin/python
 import numpy as np
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def gamma_lut(bw, gamma):
+    'Gamma look up table for bw-bit input, cached per (bit width, gamma)'
+    maxval = pow(2, bw)
+    ind = range(0, maxval)
+    val = [round(pow(float(i) / maxval, gamma) * maxval) for i in ind]
+    lut = np.array(val)
+    lut.flags.writeable = False
+    return lut
 
 class GC:
     'Gamma Correction'
@@ -9,21 +20,27 @@ class GC:
         self.lut = lut
         self.mode = mode
 
-    def execute(self):
+    def as_array(self, lut):
+        'ndarray view of a LUT, dict LUTs are indexed by 0..N-1'
+        if isinstance(lut, dict):
+            return np.array([lut[i] for i in range(len(lut))])
+        return np.asarray(lut)
+
+    def execute(self, out=None):
         img_h = self.img.shape[0]
         img_w = self.img.shape[1]
         img_c = self.img.shape[2]
-        gc_img = np.empty((img_h, img_w, img_c), np.uint16)
-        for y in range(self.img.shape[0]):
-            for x in range(self.img.shape[1]):
-                if self.mode == 'rgb':
-                    gc_img[y, x, 0] = self.lut[self.img[y, x, 0]]
-                    gc_img[y, x, 1] = self.lut[self.img[y, x, 1]]
-                    gc_img[y, x, 2] = self.lut[self.img[y, x, 2]]
-                    gc_img[y, x, :] = gc_img[y, x, :] / 4
-                elif self.mode == 'yuv':
-                    gc_img[y, x, 0] = self.lut[0][self.img[y, x, 0]]
-                    gc_img[y, x, 1] = self.lut[1][self.img[y, x, 1]]
-                    gc_img[y, x, 2] = self.lut[1][self.img[y, x, 2]]
+        gc_img = np.empty((img_h, img_w, img_c), np.uint16) if out is None else out
+        if self.mode == 'rgb':
+            lut = self.as_array(self.lut)
+            for c in range(img_c):
+                gc_img[:, :, c] = lut[self.img[:, :, c]]
+            gc_img //= 4
+        elif self.mode == 'yuv':
+            lut_y = self.as_array(self.lut[0])
+            lut_uv = self.as_array(self.lut[1])
+            gc_img[:, :, 0] = lut_y[self.img[:, :, 0]]
+            gc_img[:, :, 1] = lut_uv[self.img[:, :, 1]]
+            gc_img[:, :, 2] = lut_uv[self.img[:, :, 2]]
         self.img = gc_img
         return self.img
@@ -22,12 +22,12 @@ class HSC:
         lut_cos = dict(zip(ind, [round(cos[i]) for i in ind]))
         return lut_sin, lut_cos
 
-    def execute(self):
+    def execute(self, out=None):
         lut_sin, lut_cos = self.lut()
         img_h = self.img.shape[0]
         img_w = self.img.shape[1]
         img_c = self.img.shape[2]
-        hsc_img = np.empty((img_h, img_w, img_c), np.int16)
+        hsc_img = np.empty((img_h, img_w, img_c), np.int16) if out is None else out
         hsc_img[:,:,0] = (self.img[:,:,0] - 128) * lut_cos[self.hue] + (self.img[:,:,1] - 128) * lut_sin[self.hue] + 128
         hsc_img[:,:,1] = (self.img[:,:,1] - 128) * lut_cos[self.hue] - (self.img[:,:,0] - 128) * lut_sin[self.hue] + 128
         hsc_img[:,:,0] = self.saturation * (self.img[:,:,0] - 128) / 256 + 128
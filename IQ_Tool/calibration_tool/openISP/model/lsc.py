@@ -0,0 +1,115 @@
+#!/usr/bin/python
+import csv
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+from model.bayer import BAYER_PHASES, COLORS, as_input, as_planes, planes_out
+
+
+@lru_cache(maxsize=16)
+def read_gain_grid(table_path, mtime_ns):
+    grids = OrderedDict((color, []) for color in COLORS)
+    with open(table_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.reader(f, delimiter=','):
+            if len(row) < 2 or row[0].strip() not in grids:
+                continue    # header or blank rows
+            grids[row[0].strip()].append([float(v) for v in row[1:] if v.strip()])
+    try:
+        grid = np.array(list(grids.values()), np.float64)
+    except ValueError:
+        raise ValueError(f'{table_path}: every channel needs a grid of the same size')
+    if grid.ndim != 3 or grid.shape[1] < 2 or grid.shape[2] < 2:
+        raise ValueError(f'{table_path}: expected r/gr/gb/b grids of at least 2x2 gains')
+    grid.flags.writeable = False
+    return grid
+
+
+def load_gain_grid(table_path):
+    """
+    Per-channel gain grids of a lens shading table, (4, rows, cols) in BayerPlanes color
+    order. The csv holds one 'channel,g0,g1,...' row per grid row, channel one of
+    r/gr/gb/b, e.g. 13 rows of 17 gains, the mesh of common vendor tuning files.
+    Parsed once per file modification.
+    """
+    return read_gain_grid(table_path, os.stat(table_path).st_mtime_ns)
+
+
+def bilinear_weights(nodes, samples, phase):
+    """
+    (samples, nodes) bilinear weights of the samples of one Bayer phase along one axis:
+    sample i sits at mosaic position 2 i + phase, the grid nodes span the whole mosaic
+    from its first to its last pixel.
+    """
+    length = 2 * samples
+    pos = (2 * np.arange(samples) + phase) * (nodes - 1) / (length - 1)
+    lo = np.minimum(pos.astype(int), nodes - 2)
+    frac = pos - lo
+    weights = np.zeros((samples, nodes))
+    weights[np.arange(samples), lo] = 1 - frac
+    weights[np.arange(samples), lo + 1] = frac
+    return weights
+
+
+# upsampled gains by (grid, resolution, Bayer pattern), least recently used first out
+GAIN_PLANES = OrderedDict()
+GAIN_PLANES_SIZE = 4
+GAIN_PLANES_LOCK = threading.Lock()
+
+
+def gain_planes(grid, raw_h, raw_w, bayer_pattern):
+    """
+    Full-resolution gains of a raw_h x raw_w frame as (4, raw_h/2, raw_w/2) float32 planes,
+    each channel grid bilinearly upsampled at the positions of its own Bayer phase.
+    Computed once per grid, resolution and pattern, then served from GAIN_PLANES.
+    """
+    key = (grid.shape, grid.tobytes(), raw_h, raw_w, bayer_pattern)
+    with GAIN_PLANES_LOCK:
+        gains = GAIN_PLANES.get(key)
+        if gains is not None:
+            GAIN_PLANES.move_to_end(key)
+            return gains
+    gains = np.empty((4, raw_h // 2, raw_w // 2), np.float32)
+    for k, color in enumerate(COLORS):
+        py, px = BAYER_PHASES[bayer_pattern][color]
+        wy = bilinear_weights(grid.shape[1], raw_h // 2, py)
+        wx = bilinear_weights(grid.shape[2], raw_w // 2, px)
+        gains[k] = wy @ grid[k] @ wx.T
+    gains.flags.writeable = False
+    with GAIN_PLANES_LOCK:
+        GAIN_PLANES[key] = gains
+        while len(GAIN_PLANES) > GAIN_PLANES_SIZE:
+            GAIN_PLANES.popitem(last=False)
+    return gains
+
+
+class LSC:
+    'Lens Shading Correction'
+
+    def __init__(self, img, grid, bayer_pattern, clip, rows=None):
+        self.img = img
+        self.grid = grid                # (4, rows, cols) gains, None for no correction
+        self.bayer_pattern = bayer_pattern
+        self.clip = clip
+        self.rows = rows                # (first row, frame height) of a stripe, None for a whole frame
+
+    def clipping(self):
+        np.clip(self.img.planes, 0, self.clip, out=self.img.planes)
+        return self.img
+
+    def execute(self, out=None):
+        planes = as_planes(self.img, self.bayer_pattern)
+        lsc_img = planes_out(out, planes, np.uint16)
+        if self.grid is None:
+            lsc_img.planes[:] = planes.planes
+        else:
+            plane_h = planes.shape[1]
+            top, raw_h = (0, 2 * plane_h) if self.rows is None else self.rows
+            gains = gain_planes(self.grid, raw_h, 2 * planes.shape[2], planes.bayer_pattern)
+            # one multiply for the four planes, rows of the stripe only
+            np.multiply(planes.planes, gains[:, top // 2:top // 2 + plane_h], out=lsc_img.planes,
+                        casting='unsafe')
+        img = self.img
+        self.img = lsc_img
+        return as_input(self.clipping(), img, out)
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+import numpy as np
+from scipy.ndimage import correlate, gaussian_filter
+
+# Immerkaer's noise estimation mask: difference of two Laplacians, zero on any plane
+IMMERKAER = np.array([[1, -2, 1],
+                      [-2, 4, -2],
+                      [1, -2, 1]], dtype=np.float64)
+
+
+def luma(img):
+    'Y of a pipeline output: the first channel of a 3-channel (YUV) image, a 2-D image as is'
+    img = np.asarray(img)
+    return (img[:, :, 0] if img.ndim == 3 else img).astype(np.float64)
+
+
+def ssim(img, reference, data_range=255, sigma=1.5):
+    'mean structural similarity of the lumas (Wang et al. 2004, 11x11 Gaussian window)'
+    if reference is None:
+        raise ValueError('ssim needs a reference image')
+    x = luma(img)
+    y = luma(reference)
+    if x.shape != y.shape:
+        raise ValueError(f'ssim: image {x.shape} and reference {y.shape} differ in size')
+    c1 = (0.01 * data_range) ** 2
+    c2 = (0.03 * data_range) ** 2
+
+    def blur(a):
+        return gaussian_filter(a, sigma, truncate=3.5)
+
+    mx = blur(x)
+    my = blur(y)
+    vx = blur(x * x) - mx * mx
+    vy = blur(y * y) - my * my
+    cxy = blur(x * y) - mx * my
+    ssim_map = ((2 * mx * my + c1) * (2 * cxy + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(ssim_map.mean())
+
+
+def noise_std(img, reference=None):
+    'luma noise standard deviation, Immerkaer (1996) fast estimate, no reference needed'
+    y = luma(img)
+    h, w = y.shape
+    response = correlate(y, IMMERKAER)[1:-1, 1:-1]
+    return float(np.sqrt(np.pi / 2) * np.abs(response).sum() / (6 * (w - 2) * (h - 2)))
+
+
+def mtf50(img, reference=None, roi=None, oversample=4):
+    """
+    Spatial frequency (cycles/pixel) where the MTF falls to 0.5, slanted-edge method:
+    the luma of roi (y0, y1, x0, x1, default the whole image) must hold one straight,
+    slightly tilted edge. Rows are projected along the fitted edge into a 1/oversample
+    pixel edge spread function, whose derivative is Fourier transformed.
+    """
+    y = luma(img)
+    if roi is not None:
+        y = y[roi[0]:roi[1], roi[2]:roi[3]]
+    if np.abs(np.diff(y, axis=0)).sum() > np.abs(np.diff(y, axis=1)).sum():
+        y = y.T     # near-horizontal edge
+    grad = np.abs(np.diff(y, axis=1))
+    weight = grad.sum(axis=1)
+    rows = np.nonzero(weight > 0)[0]
+    if len(rows) < 2:
+        raise ValueError('mtf50: no edge found')
+    centroid = (grad[rows] * (np.arange(grad.shape[1]) + 0.5)).sum(axis=1) / weight[rows]
+    slope, intercept = np.polyfit(rows, centroid, 1)
+
+    distance = np.arange(y.shape[1])[None, :] - (slope * np.arange(y.shape[0])[:, None] + intercept)
+    bins = np.round(distance * oversample).astype(np.int64)
+    bins -= bins.min()
+    counts = np.bincount(bins.ravel())
+    sums = np.bincount(bins.ravel(), y.ravel())
+    filled = counts > 0
+    positions = np.arange(len(counts))
+    esf = np.interp(positions, positions[filled], sums[filled] / counts[filled])
+
+    lsf = np.diff(esf) * np.hamming(len(esf) - 1)
+    mtf = np.abs(np.fft.rfft(lsf))
+    mtf /= mtf[0]
+    freqs = np.fft.rfftfreq(len(lsf), d=1 / oversample)
+    below = np.nonzero(mtf < 0.5)[0]
+    if len(below) == 0:
+        return float(freqs[-1])
+    k = below[0]
+    return float(freqs[k - 1] + (mtf[k - 1] - 0.5) / (mtf[k - 1] - mtf[k]) * (freqs[k] - freqs[k - 1]))
+
+
+# name -> metric(img, reference), the scores a sweep can report
+METRICS = {
+    'ssim': ssim,
+    'noise_std': noise_std,
+    'mtf50': mtf50,
+}
+
+# metrics scoring against a reference image
+REFERENCE_METRICS = ('ssim',)
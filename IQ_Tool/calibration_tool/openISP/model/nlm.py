@@ -4,12 +4,13 @@ import numpy as np
 class NLM:
     'Non-Local Means Denoising'
 
-    def __init__(self, img, ds, Ds, h, clip):
+    def __init__(self, img, ds, Ds, h, clip, vectorized=True):
         self.img = img
         self.ds = ds    # neighbour window size - 1 /2
         self.Ds = Ds    # search window size - 1 / 2
         self.h = h
         self.clip = clip
+        self.vectorized = vectorized
 
     def padding(self):
         img_pad = np.pad(self.img, (self.Ds, self.Ds), 'reflect')
@@ -39,12 +40,73 @@ class NLM:
                     average = average + w * img[start_y, start_x]
         return sweight, average, wmax
 
-    def execute(self):
+    def weightLut(self):
+        'exp(-dist/h^2) indexed by the integer sum of squared differences over a patch'
+        n = pow(2 * self.ds + 1, 2)
+        max_ssd = n * 65535     # squared differences wrap to uint16 like the per-pixel code
+        # exp() underflows to 0 beyond ~745, no need to tabulate further
+        max_ssd = min(max_ssd, int(np.ceil(746 * n * pow(self.h, 2))))
+        ssd = np.arange(max_ssd + 1)
+        lut = np.exp(-(ssd / n) / pow(self.h, 2))
+        return lut
+
+    def boxSum(self, field):
+        'sum over every (2ds+1)x(2ds+1) window of field, via an integral image'
+        k = 2 * self.ds + 1
+        integral = np.zeros((field.shape[0] + 1, field.shape[1] + 1), np.int64)
+        np.cumsum(field, axis=0, out=integral[1:, 1:])
+        np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+        return integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+
+    def execute_vectorized(self, out=None):
+        """
+        Same search window as calWeights, but the loops run over search offsets only:
+        for each offset the squared-difference field of the whole frame is box-filtered
+        once and turned into weights through the exp look up table.
+        """
+        img_pad = self.padding()
+        img_pad = img_pad.astype(np.uint16)
+        raw_h = self.img.shape[0]
+        raw_w = self.img.shape[1]
+        Ds = self.Ds
+        ds = self.ds
+        lut = self.weightLut()
+
+        # centre patches of every output pixel, with a ds margin for the box filter
+        center_w = img_pad[Ds - ds:Ds + raw_h + ds, Ds - ds:Ds + raw_w + ds].astype(np.int64)
+        center = img_pad[Ds:Ds + raw_h, Ds:Ds + raw_w]
+        wmax = np.zeros((raw_h, raw_w))
+        sweight = np.zeros((raw_h, raw_w))
+        average = np.zeros((raw_h, raw_w))
+        for j in range(2 * Ds + 1 - 2 * ds - 1):
+            for i in range(2 * Ds + 1 - 2 * ds - 1):
+                dy = ds + j - Ds
+                dx = ds + i - Ds
+                neighbour_w = img_pad[Ds - ds + dy:Ds + raw_h + ds + dy, Ds - ds + dx:Ds + raw_w + ds + dx]
+                sub = neighbour_w - center_w
+                ssd = self.boxSum(np.multiply(sub, sub) & 0xFFFF)
+                w = lut[np.minimum(ssd, lut.shape[0] - 1)]
+                # calWeights skips the offset only where (j, i) equals the padded centre position
+                if Ds <= j < Ds + raw_h and Ds <= i < Ds + raw_w:
+                    w[j - Ds, i - Ds] = 0
+                np.maximum(wmax, w, out=wmax)
+                sweight += w
+                average += w * img_pad[Ds + dy:Ds + raw_h + dy, Ds + dx:Ds + raw_w + dx]
+        average = average + wmax * center
+        sweight = sweight + wmax
+        nlm_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
+        nlm_img[:, :] = average / sweight
+        self.img = nlm_img
+        return self.clipping()
+
+    def execute(self, out=None):
+        if self.vectorized:
+            return self.execute_vectorized(out)
         img_pad = self.padding()
         img_pad = img_pad.astype(np.uint16)
         raw_h = self.img.shape[0]
         raw_w = self.img.shape[1]
-        nlm_img = np.empty((raw_h, raw_w), np.uint16)
+        nlm_img = np.empty((raw_h, raw_w), np.uint16) if out is None else out
         kernel = np.ones((2*self.ds+1, 2*self.ds+1)) / pow(2*self.ds+1, 2)
         for y in range(img_pad.shape[0] - 2 * self.Ds):
             for x in range(img_pad.shape[1] - 2 * self.Ds):
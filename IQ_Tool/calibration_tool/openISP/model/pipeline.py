@@ -0,0 +1,483 @@
+#!/usr/bin/python
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+
+from model.dpc import DPC
+from model.blc import BLC
+from model.lsc import LSC, load_gain_grid
+from model.aaf import AAF
+from model.awb import WBGC
+from model.cnf import CNF
+from model.cfa import CFA
+from model.gac import GC, gamma_lut
+from model.ccm import CCM
+from model.csc import CSC
+from model.bnf import BNF
+from model.eeh import EE
+from model.fcs import FCS
+from model.bcc import BCC
+from model.hsc import HSC
+from model.nlm import NLM
+from model.bayer import BayerPlanes
+from model.preview import bin_bayer, proxy_parameters
+from model.config import default_config, load_config
+
+# canonical stage order, RAW -> RGB -> YUV
+STAGE_ORDER = ['dpc', 'blc', 'lsc', 'aaf', 'awb', 'cnf', 'cfa', 'ccm', 'gc', 'csc', 'nlm', 'bnf', 'ee', 'fcs', 'hsc', 'bcc']
+
+# values used when a parameter is missing from the config (b_gain has no row in config.csv)
+DEFAULT_PARAMETERS = default_config().flat()
+
+GAMMA_BW = 10
+GAMMA = 0.5
+NLM_DS = 1      # neighbour window size - 1 / 2
+NLM_DS_SEARCH = 4   # search window size - 1 / 2
+
+
+def load_parameters(config_path):
+    'config.csv as an ordered {name: typed value} dict, validated against model.config.SCHEMA'
+    return load_config(config_path).flat()
+
+
+def as_int(p, name):
+    return int(float(p[name]))
+
+
+def as_float(p, name):
+    return float(p[name])
+
+
+def as_matrix(p, prefix, rows, cols, scale=1):
+    return np.array([[scale * float(p[f'{prefix}{r}{c}']) for c in range(cols)] for r in range(rows)])
+
+
+def matrix_keys(prefix, rows, cols):
+    return tuple(f'{prefix}{r}{c}' for r in range(rows) for c in range(cols))
+
+
+AWB_KEYS = ('r_gain', 'gr_gain', 'gb_gain', 'b_gain')
+
+
+def awb_gains(p):
+    return [as_float(p, 'r_gain'), as_float(p, 'gr_gain'), as_float(p, 'gb_gain'), as_float(p, 'b_gain')]
+
+
+def run_dpc(img, p, frame, out=None):
+    return DPC(img, as_int(p, 'dpc_thres'), p['dpc_mode'], as_int(p, 'dpc_clip')).execute(out)
+
+
+def run_blc(img, p, frame, out=None):
+    parameter = [as_int(p, 'bl_r'), as_int(p, 'bl_gr'), as_int(p, 'bl_gb'), as_int(p, 'bl_b'),
+                 as_int(p, 'alpha'), as_int(p, 'beta')]
+    return BLC(img, parameter, p['bayer_pattern'], as_int(p, 'blc_clip')).execute(out)
+
+
+def run_lsc(img, p, frame, out=None):
+    grid = load_gain_grid(p['lsc_table']) if p['lsc_table'] else None
+    # gains depend on the position in the frame, stripes carry theirs in frame['rows']
+    return LSC(img, grid, p['bayer_pattern'], as_int(p, 'lsc_clip'), frame.get('rows')).execute(out)
+
+
+def run_aaf(img, p, frame, out=None):
+    return AAF(img).execute(out)
+
+
+def run_awb(img, p, frame, out=None):
+    return WBGC(img, awb_gains(p), p['bayer_pattern'], as_int(p, 'awb_clip')).execute(out)
+
+
+def run_cnf(img, p, frame, out=None):
+    return CNF(img, p['bayer_pattern'], 0, awb_gains(p), 1023).execute(out)
+
+
+def run_cfa(img, p, frame, out=None):
+    return CFA(img, p['cfa_mode'], p['bayer_pattern'], as_int(p, 'cfa_clip')).execute(out)
+
+
+def run_ccm(img, p, frame, out=None):
+    return CCM(img, as_matrix(p, 'ccm_', 3, 4)).execute(out)
+
+
+def run_gc(img, p, frame, out=None):
+    return GC(img, gamma_lut(GAMMA_BW, GAMMA), 'rgb').execute(out)
+
+
+def run_csc(img, p, frame, out=None):
+    return CSC(img, as_matrix(p, 'csc_', 3, 4, 1024)).execute(out)
+
+
+def run_nlm(img, p, frame, out=None):
+    return NLM(img, NLM_DS, NLM_DS_SEARCH, as_int(p, 'nlm_h'), as_int(p, 'nlm_clip')).execute(out)
+
+
+def run_bnf(img, p, frame, out=None):
+    bnf_rw = [as_int(p, f'bnf_rw_{i}') for i in range(4)]
+    bnf_rthres = [as_int(p, f'bnf_rthres_{i}') for i in range(3)]
+    return BNF(img, as_matrix(p, 'bnf_dw_', 5, 5), bnf_rw, bnf_rthres, as_int(p, 'bnf_clip')).execute(out)
+
+
+def run_ee(img, p, frame, out=None):
+    # out is the (enhanced y, edge map) pair, see Stage.extra
+    ee_out, em_out = (None, None) if out is None else out
+    ee_gain = [as_int(p, 'ee_gain_min'), as_int(p, 'ee_gain_max')]
+    ee_thres = [as_int(p, 'ee_thres_min'), as_int(p, 'ee_thres_max')]
+    ee_emclip = [as_int(p, 'ee_emclip_min'), as_int(p, 'ee_emclip_max')]
+    img_ee, frame['edgemap'] = EE(img, as_matrix(p, 'edge_filter_', 3, 5), ee_gain, ee_thres, ee_emclip).execute(ee_out, em_out)
+    return img_ee
+
+
+def run_fcs(img, p, frame, out=None):
+    edgemap = frame.get('edgemap')
+    if edgemap is None:
+        edgemap = np.zeros(img.shape[0:2], np.int16)
+    fcs_edge = [as_int(p, 'fcs_edge_min'), as_int(p, 'fcs_edge_max')]
+    return FCS(img, edgemap, fcs_edge, as_int(p, 'fcs_gain'), as_int(p, 'fcs_intercept'),
+               as_int(p, 'fcs_slope')).execute(out)
+
+
+def run_hsc(img, p, frame, out=None):
+    return HSC(img, as_int(p, 'hue'), as_int(p, 'saturation'), as_int(p, 'hsc_clip')).execute(out)
+
+
+def run_bcc(img, p, frame, out=None):
+    contrast = as_int(p, 'contrast') / pow(2, 5)    # [-32,128]
+    return BCC(img, as_int(p, 'brightness'), contrast, as_int(p, 'bcc_clip')).execute(out)
+
+
+def file_stamp(path):
+    '(mtime, size) of a file the stage reads, so editing it in place invalidates cached outputs'
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'    # the stage itself reports it
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Stage:
+    'One model.* stage: the plane it works on, the dtypes it accepts and how to run it'
+
+    def __init__(self, name, title, plane, run, keys=(), accepts=None, dtype=None, halo=0, extra=(), files=()):
+        self.name = name
+        self.title = title
+        self.plane = plane      # 'bayer' (BayerPlanes), 'img' (mosaic/RGB frame), 'y' or 'uv'
+        self.run = run
+        self.accepts = accepts  # input dtypes used as-is, None for any
+        self.dtype = dtype      # conversion target for any other input dtype
+        self.halo = halo        # rows read above/below an output row (padding of the stage)
+        self.keys = keys        # parameters the stage reads, part of its cache key
+        self.extra = extra      # other frame entries the stage writes, pooled along with its output
+        self.files = files      # keys holding file paths, their modification time is part of the cache key
+
+    def key(self, upstream, parameters):
+        'cache key of the stage output: upstream key plus the stage parameters'
+        h = hashlib.blake2b(upstream, digest_size=16)
+        h.update(self.name.encode())
+        h.update(repr([str(parameters[k]) for k in self.keys]).encode())
+        h.update(repr([file_stamp(parameters[k]) for k in self.files]).encode())
+        return h.digest()
+
+    def negotiate(self, img):
+        'convert only when the current dtype is not one the stage handles correctly'
+        if self.accepts is None or img.dtype in self.accepts:
+            return img
+        return img.astype(self.dtype)
+
+
+RAW_DTYPES = (np.dtype(np.uint16), np.dtype(np.int16))
+SIGNED_DTYPES = (np.dtype(np.int16), np.dtype(np.int32), np.dtype(np.float32), np.dtype(np.float64))
+
+BLC_KEYS = ('bl_r', 'bl_gr', 'bl_gb', 'bl_b', 'alpha', 'beta', 'bayer_pattern', 'blc_clip')
+BNF_KEYS = matrix_keys('bnf_dw_', 5, 5) + ('bnf_rw_0', 'bnf_rw_1', 'bnf_rw_2', 'bnf_rw_3',
+                                           'bnf_rthres_0', 'bnf_rthres_1', 'bnf_rthres_2', 'bnf_clip')
+EE_KEYS = matrix_keys('edge_filter_', 3, 5) + ('ee_gain_min', 'ee_gain_max', 'ee_thres_min', 'ee_thres_max',
+                                               'ee_emclip_min', 'ee_emclip_max')
+FCS_KEYS = ('fcs_edge_min', 'fcs_edge_max', 'fcs_gain', 'fcs_intercept', 'fcs_slope')
+
+# Pipeline.split_bayer tags the planes with the pattern, so every 'bayer' stage keys on it
+STAGES = OrderedDict((stage.name, stage) for stage in [
+    Stage('dpc', 'Dead Pixel Correction', 'bayer', run_dpc, ('dpc_thres', 'dpc_mode', 'dpc_clip', 'bayer_pattern'),
+          RAW_DTYPES, np.uint16, halo=2),
+    Stage('blc', 'Black Level Compensation', 'bayer', run_blc, BLC_KEYS, RAW_DTYPES, np.uint16),
+    Stage('lsc', 'Lens Shading Correction', 'bayer', run_lsc, ('lsc_table', 'bayer_pattern', 'lsc_clip'),
+          RAW_DTYPES, np.uint16, files=('lsc_table',)),
+    Stage('aaf', 'Anti-aliasing Filtering', 'bayer', run_aaf, ('bayer_pattern',), RAW_DTYPES, np.uint16, halo=2),
+    Stage('awb', 'White Balance Gain', 'bayer', run_awb, AWB_KEYS + ('bayer_pattern', 'awb_clip'),
+          RAW_DTYPES, np.uint16),
+    Stage('cnf', 'Chroma Noise Filtering', 'bayer', run_cnf, AWB_KEYS + ('bayer_pattern',),
+          RAW_DTYPES, np.uint16, halo=4),
+    Stage('cfa', 'Demosaicing', 'img', run_cfa, ('cfa_mode', 'bayer_pattern', 'cfa_clip'),
+          RAW_DTYPES, np.uint16, halo=2),
+    Stage('ccm', 'Color Correction', 'img', run_ccm, matrix_keys('ccm_', 3, 4)),
+    # LUT indices must be integers
+    Stage('gc', 'Gamma Correction', 'img', run_gc, (), (np.dtype(np.uint8),) + RAW_DTYPES, np.uint16),
+    Stage('csc', 'Color Space Conversion', 'img', run_csc, matrix_keys('csc_', 3, 4)),
+    Stage('nlm', 'Non Local Means Denoising', 'y', run_nlm, ('nlm_h', 'nlm_clip'), halo=NLM_DS_SEARCH),
+    Stage('bnf', 'Bilateral Filtering', 'y', run_bnf, BNF_KEYS, halo=2),
+    Stage('ee', 'Edge Enhancement', 'y', run_ee, EE_KEYS, halo=1, extra=('edgemap',)),
+    Stage('fcs', 'False Color Suppresion', 'uv', run_fcs, FCS_KEYS),
+    # both subtract an offset of 127/128, unsigned input would wrap
+    Stage('hsc', 'Hue/Saturation Adjustment', 'uv', run_hsc, ('hue', 'saturation', 'hsc_clip'),
+          SIGNED_DTYPES, np.int16),
+    Stage('bcc', 'Brightness/Contrast Adjustment', 'y', run_bcc, ('brightness', 'contrast', 'bcc_clip'),
+          SIGNED_DTYPES, np.int16),
+])
+
+
+class StageCache:
+    """
+    Stage outputs keyed by Stage.key(), least recently used first out once the stored
+    arrays exceed max_bytes. Stored arrays are made read-only so a stage that writes into
+    its input fails loudly instead of corrupting a cached result. Safe to share between
+    threads running pipelines at the same time.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        'copy of the cached frame dict, None when key is not (or no longer) cached'
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return dict(entry[0])
+
+    def put(self, key, frame):
+        nbytes = sum(img.nbytes for img in frame.values())
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            for img in frame.values():
+                img.setflags(write=False)
+            self.entries[key] = (dict(frame), nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+class BufferPool:
+    """
+    Stage output buffers reused from frame to frame, one per (stage, input shape, input
+    dtype): the first frame at a resolution allocates them, later frames write into them
+    through execute(out=...). hits/misses count reused and newly allocated outputs.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        out = self.buffers.get(key)
+        if out is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return out
+
+    def put(self, key, img):
+        # keep only arrays the stage allocated itself, never views of its input
+        imgs = img if isinstance(img, tuple) else (img,)
+        if all(i.base is None for i in imgs):
+            self.buffers[key] = img
+
+    def nbytes(self):
+        imgs = [i for img in self.buffers.values() for i in (img if isinstance(img, tuple) else (img,))]
+        return sum(img.nbytes for img in imgs)
+
+
+def frame_key(rawimg):
+    'cache key of the RAW input'
+    rawimg = np.ascontiguousarray(rawimg)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((rawimg.shape, rawimg.dtype.str)).encode())
+    h.update(rawimg.data)
+    return h.digest()
+
+
+class Pipeline:
+    'Ordered chain of model.* stages driven by one parameter dict'
+
+    def __init__(self, stages, parameters, stripe_rows=None, cache=None, profiler=None, preview=1, pool=None):
+        self.stages = [STAGES[stage] if isinstance(stage, str) else stage for stage in stages]
+        self.parameters = dict(DEFAULT_PARAMETERS)
+        self.parameters.update(parameters)
+        self.preview = preview          # > 1 runs on a binned proxy, see model.preview
+        self.parameters = proxy_parameters(self.parameters, preview)
+        self.stripe_rows = stripe_rows  # None or 0 runs the whole frame at once
+        self.cache = cache              # StageCache shared across runs, full-frame runs only
+        self.profiler = profiler        # optional model.profiler.StageProfiler
+        self.pool = pool                # BufferPool, outputs are then only valid until the next frame
+        if pool is not None and cache is not None:
+            raise ValueError('cached stage outputs cannot live in pooled buffers')
+        self.timings = OrderedDict()
+
+    def halo(self):
+        'context rows a stripe needs on each side so its own rows match the full-frame run'
+        halo = sum(stage.halo for stage in self.stages)
+        return halo + halo % 2     # stripes must start on an even row to keep the Bayer phase
+
+    def split_bayer(self, frame):
+        'RAW stages work on the mosaic split once into Bayer planes, see model.bayer'
+        img = frame.pop('img')
+        if img.ndim != 2:
+            raise ValueError('RAW-domain stages need a Bayer mosaic, run them before cfa')
+        key = ('bayer', img.shape, img.dtype)
+        planes = self.pool.get(key) if self.pool is not None else None
+        frame['bayer'] = BayerPlanes.split(img, self.parameters['bayer_pattern'], planes)
+        if self.pool is not None and planes is None:
+            self.pool.put(key, frame['bayer'])
+
+    def merge_bayer(self, frame):
+        'back to the mosaic, before demosaicing or as the output of a RAW-only chain'
+        planes = frame.pop('bayer')
+        key = ('mosaic', planes.shape, planes.dtype)
+        img = self.pool.get(key) if self.pool is not None else None
+        frame['img'] = planes.mosaic(img)
+        if self.pool is not None and img is None:
+            self.pool.put(key, frame['img'])
+
+    def split_yuv(self, frame):
+        'YUV stages work on views of the CSC output, Y and UV are carried separately'
+        img = frame.pop('img')
+        if img.ndim != 3:
+            raise ValueError('YUV-domain stages need a 3-channel image, run csc first')
+        frame['y'] = img[:, :, 0]
+        frame['uv'] = img[:, :, 1:3]
+
+    def merge_yuv(self, frame):
+        y = frame['y']
+        key = ('yuv', y.shape)
+        yuvimg = self.pool.get(key) if self.pool is not None else None
+        if yuvimg is None:
+            yuvimg = np.empty((y.shape[0], y.shape[1], 3), np.uint8)
+            if self.pool is not None:
+                self.pool.put(key, yuvimg)
+        yuvimg[:, :, 0] = np.clip(y, 0, 255)
+        yuvimg[:, :, 1:3] = np.clip(frame['uv'], 0, 255)
+        return yuvimg
+
+    def run_stages(self, rawimg, progress_callback=None, cache=None, stripe=None, rows=None):
+        frame = {'img': rawimg}
+        if rows is not None:
+            frame['rows'] = rows    # (first row, frame height) of a stripe
+        first = 0
+        if cache is not None:
+            # resume after the last stage whose output is still cached
+            keys = [frame_key(rawimg)]
+            for stage in self.stages:
+                keys.append(stage.key(keys[-1], self.parameters))
+            for first in range(len(self.stages), 0, -1):
+                cached = cache.get(keys[first])
+                if cached is not None:
+                    frame = cached
+                    break
+            else:
+                first = 0
+            if first and progress_callback:
+                progress_callback(int((first / len(self.stages)) * 100))
+        for step, stage in enumerate(self.stages[first:], first + 1):
+            self.run_stage(frame, stage, stripe)
+            if cache is not None:
+                cache.put(keys[step], frame)
+            if progress_callback:
+                progress_callback(int((step / len(self.stages)) * 100))
+        return self.output(frame)
+
+    def run_stage(self, frame, stage, stripe=None):
+        'run one stage on a frame dict in place'
+        self.enter(frame, stage)
+        start = time.perf_counter()
+        img = stage.negotiate(frame[stage.plane])
+        out = None
+        if self.pool is not None:
+            buffer_key = (stage.name, img.shape, img.dtype)
+            out = self.pool.get(buffer_key)
+        if self.profiler:
+            frame[stage.plane] = self.profiler.run(stage, img, self.parameters, frame, out, stripe)
+        else:
+            frame[stage.plane] = stage.run(img, self.parameters, frame, out)
+        if self.pool is not None and out is None:
+            outputs = (frame[stage.plane],) + tuple(frame[name] for name in stage.extra)
+            self.pool.put(buffer_key, outputs if stage.extra else outputs[0])
+        self.timings[stage.name] = self.timings.get(stage.name, 0) + time.perf_counter() - start
+
+    def enter(self, frame, stage):
+        'bring the frame to the representation the stage works on'
+        if stage.plane == 'bayer':
+            if 'img' in frame:
+                self.split_bayer(frame)
+            elif 'bayer' not in frame:
+                raise ValueError(f'{stage.name} cannot run after the YUV-domain stages')
+            return
+        if 'bayer' in frame:
+            self.merge_bayer(frame)
+        if stage.plane != 'img' and 'img' in frame:
+            self.split_yuv(frame)
+        elif stage.plane == 'img' and 'img' not in frame:
+            raise ValueError(f'{stage.name} cannot run after the YUV-domain stages')
+
+    def output(self, frame):
+        'final image of a frame dict: the RAW/RGB image, or the merged YUV'
+        if 'bayer' in frame:
+            self.merge_bayer(frame)
+        if 'img' in frame:
+            return frame['img']
+        return self.merge_yuv(frame)
+
+    def execute_tiled(self, rawimg, progress_callback=None):
+        """
+        Run the chain stripe by stripe: each stripe of stripe_rows rows is cut from the RAW
+        with halo() extra rows on each side, processed, and its own rows copied into the
+        output. Every stage pads the stripe edge by its halo, so the error introduced there
+        shrinks by one stage halo per stage and never reaches the kept rows.
+        """
+        raw_h = rawimg.shape[0]
+        stripe_rows = self.stripe_rows + self.stripe_rows % 2
+        halo = self.halo()
+        out = None
+        for stripe, top in enumerate(range(0, raw_h, stripe_rows)):
+            bottom = min(top + stripe_rows, raw_h)
+            pad_top = max(top - halo, 0)
+            pad_bottom = min(bottom + halo, raw_h)
+            img = self.run_stages(rawimg[pad_top:pad_bottom], stripe=stripe, rows=(pad_top, raw_h))
+            if out is None:
+                out = np.empty((raw_h,) + img.shape[1:], img.dtype)
+            out[top:bottom] = img[top - pad_top:bottom - pad_top]
+            if progress_callback:
+                progress_callback(int((bottom / raw_h) * 100))
+        return out
+
+    def execute(self, rawimg, progress_callback=None):
+        self.timings = OrderedDict()
+        rawimg = bin_bayer(rawimg, self.preview)
+        if self.profiler:
+            self.profiler.start()
+        try:
+            if self.stripe_rows:
+                return self.execute_tiled(rawimg, progress_callback)
+            return self.run_stages(rawimg, progress_callback, self.cache)
+        finally:
+            if self.profiler:
+                self.profiler.stop()
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+import numpy as np
+
+# proxy binning factors offered by the GUIs, 1 is the full-resolution render
+PREVIEW_FACTORS = (1, 2, 4)
+
+# thresholds against sensor noise: averaging factor x factor samples divides noise std by factor
+NOISE_PARAMETERS = ('dpc_thres', 'nlm_h')
+
+
+def bin_bayer(rawimg, factor):
+    """
+    factor x factor binning of each Bayer phase plane, re-mosaiced in the same CFA
+    order, so the proxy is a (H/factor, W/factor) mosaic every RAW stage accepts.
+    Rows/columns that do not fill a whole bin are dropped.
+    """
+    if factor == 1:
+        return rawimg
+    plane_h = rawimg.shape[0] // 2 // factor
+    plane_w = rawimg.shape[1] // 2 // factor
+    area = factor * factor
+    proxy = np.empty((plane_h * 2, plane_w * 2), np.uint16)
+    for py in range(2):
+        for px in range(2):
+            plane = rawimg[py:2 * plane_h * factor:2, px:2 * plane_w * factor:2].astype(np.uint32)
+            bins = plane.reshape(plane_h, factor, plane_w, factor).sum(axis=(1, 3))
+            proxy[py::2, px::2] = (bins + area // 2) // area
+    return proxy
+
+
+def proxy_parameters(parameters, factor):
+    """
+    Parameters for running the chain on a bin_bayer proxy. Noise thresholds shrink with
+    the noise, and the 5x5 BNF distance weights are resampled so a proxy pixel at distance
+    d gets the full-resolution weight of distance d * factor (0 beyond the kernel).
+    """
+    proxy = dict(parameters)
+    if factor == 1:
+        return proxy
+    for name in NOISE_PARAMETERS:
+        proxy[name] = max(1, round(float(parameters[name]) / factor))
+    for r in range(5):
+        for c in range(5):
+            fr = 2 + (r - 2) * factor
+            fc = 2 + (c - 2) * factor
+            inside = 0 <= fr < 5 and 0 <= fc < 5
+            proxy[f'bnf_dw_{r}{c}'] = parameters[f'bnf_dw_{fr}{fc}'] if inside else 0
+    return proxy
+
+
+def pyramid(img, min_size=256):
+    """
+    Mip levels of an (H, W) or (H, W, C) uint8 display image: level k is the 2^k x 2^k
+    box average of level 0, down to the first level whose longer side is at most min_size.
+    Odd last rows/columns are dropped from the next level.
+    """
+    levels = [img]
+    while max(img.shape[:2]) > min_size and min(img.shape[:2]) >= 2:
+        level_h = img.shape[0] // 2
+        level_w = img.shape[1] // 2
+        acc = img[0:2 * level_h:2, 0:2 * level_w:2].astype(np.uint16)
+        acc += img[1:2 * level_h:2, 0:2 * level_w:2]
+        acc += img[0:2 * level_h:2, 1:2 * level_w:2]
+        acc += img[1:2 * level_h:2, 1:2 * level_w:2]
+        acc += 2
+        acc >>= 2
+        img = acc.astype(np.uint8)
+        levels.append(img)
+    return levels
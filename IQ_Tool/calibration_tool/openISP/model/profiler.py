@@ -0,0 +1,105 @@
+#!/usr/bin/python
+import json
+import os
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+from model.bayer import BayerPlanes
+
+
+def describe(img):
+    'dtype, shape and value range of a stage input/output'
+    img = np.asarray(img.planes if isinstance(img, BayerPlanes) else img)
+    info = {'dtype': str(img.dtype), 'shape': list(img.shape)}
+    if img.size:
+        info['min'] = float(img.min())
+        info['max'] = float(img.max())
+        info['mean'] = float(img.mean())
+    return info
+
+
+class StageProfiler:
+    """
+    Opt-in per-stage instrumentation for Pipeline: wall time, CPU time, peak bytes
+    allocated during the stage and bytes it left allocated, i.e. its new outputs
+    (tracemalloc), input/output dtype and shape and the
+    output min/max/mean, so silent wraps (e.g. a negative result cast to unsigned)
+    show up as suspicious ranges.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.origin = time.perf_counter()
+        self.started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def run(self, stage, img, parameters, frame, out=None, stripe=None):
+        'run one stage and record what it did'
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        out = stage.run(img, parameters, frame, out)
+        cpu = time.process_time() - cpu
+        end = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        record = {
+            'stage': stage.name,
+            'title': stage.title,
+            'start': wall - self.origin,
+            'wall': end - wall,
+            'cpu': cpu,
+            'peak_bytes': peak - base,
+            'retained_bytes': current - base,
+            'input': describe(img),
+            'output': describe(out),
+            'thread': threading.get_ident(),
+        }
+        if stripe is not None:
+            record['stripe'] = stripe
+        self.records.append(record)
+        return out
+
+    def summary(self):
+        'records summed per stage, in pipeline order'
+        stages = {}
+        for record in self.records:
+            total = stages.setdefault(record['stage'], {'wall': 0, 'cpu': 0, 'peak_bytes': 0, 'calls': 0})
+            total['wall'] += record['wall']
+            total['cpu'] += record['cpu']
+            total['peak_bytes'] = max(total['peak_bytes'], record['peak_bytes'])
+            total['calls'] += 1
+        return stages
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'stages': self.summary(), 'records': self.records}, f, indent=2)
+
+    def to_chrome_trace(self, path):
+        'trace file for chrome://tracing or Perfetto, one complete event per stage run'
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in record.items() if k not in ('stage', 'start', 'wall', 'thread')}
+            events.append({
+                'name': record['stage'],
+                'cat': 'isp',
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['wall'] * 1e6,
+                'pid': os.getpid(),
+                'tid': record['thread'],
+                'args': args,
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
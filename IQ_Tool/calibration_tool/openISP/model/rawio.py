@@ -0,0 +1,110 @@
+#!/usr/bin/python
+import os
+import numpy as np
+
+# format: (bits per pixel, pixels per group, bytes per group) of the MIPI CSI-2 packing
+RAW_FORMATS = {
+    'raw10': (10, 4, 5),
+    'raw12': (12, 2, 3),
+    'raw14': (14, 4, 7),
+    'raw16': (16, 1, 2),    # unpacked little-endian uint16, as written by np.tofile
+}
+
+
+def line_bytes(width, fmt):
+    'bytes of one packed line without padding'
+    _, pixels, nbytes = RAW_FORMATS[fmt]
+    return -(-width // pixels) * nbytes
+
+
+def unpack_raw10(groups):
+    'groups: (h, n, 5) uint8, 4 MSB bytes then one byte holding the 2 LSBs of each pixel'
+    img = groups[:, :, 0:4].astype(np.uint16) << 2
+    img |= (groups[:, :, 4:5] >> np.array([0, 2, 4, 6], np.uint8)) & 0x3
+    return img
+
+
+def unpack_raw12(groups):
+    'groups: (h, n, 3) uint8, 2 MSB bytes then one byte holding the 4 LSBs of each pixel'
+    img = groups[:, :, 0:2].astype(np.uint16) << 4
+    img |= (groups[:, :, 2:3] >> np.array([0, 4], np.uint8)) & 0xF
+    return img
+
+
+def unpack_raw14(groups):
+    'groups: (h, n, 7) uint8, 4 MSB bytes then 3 bytes holding the 6 LSBs of each pixel'
+    img = groups[:, :, 0:4].astype(np.uint16) << 6
+    lsb = groups[:, :, 4:7].astype(np.uint16)
+    img[:, :, 0] |= lsb[:, :, 0] & 0x3F
+    img[:, :, 1] |= (lsb[:, :, 0] >> 6) | ((lsb[:, :, 1] & 0xF) << 2)
+    img[:, :, 2] |= (lsb[:, :, 1] >> 4) | ((lsb[:, :, 2] & 0x3) << 4)
+    img[:, :, 3] |= lsb[:, :, 2] >> 2
+    return img
+
+
+UNPACK = {'raw10': unpack_raw10, 'raw12': unpack_raw12, 'raw14': unpack_raw14}
+
+
+def unpack(lines, width, fmt):
+    """
+    Unpack (h, stride) bytes into an (h, width) uint16 image. Line padding beyond the
+    packed data is ignored, so any stride works.
+    """
+    img_h = lines.shape[0]
+    if fmt == 'raw16':
+        return lines[:, 0:2 * width].view('<u2')
+    _, pixels, nbytes = RAW_FORMATS[fmt]
+    groups = lines[:, 0:line_bytes(width, fmt)].reshape(img_h, -1, nbytes)
+    img = UNPACK[fmt](groups)
+    return img.reshape(img_h, -1)[:, 0:width]
+
+
+def check_stride(width, fmt, stride=None):
+    'line pitch in bytes of a RAW layout, validated'
+    if fmt not in RAW_FORMATS:
+        raise ValueError(f'unknown RAW format {fmt}, expected one of {list(RAW_FORMATS)}')
+    if stride is None:
+        return line_bytes(width, fmt)
+    if stride < line_bytes(width, fmt):
+        raise ValueError(f'stride {stride} is shorter than a {fmt} line of {width} pixels')
+    return stride
+
+
+def unpack_frame(lines, width, fmt, out_bits=None):
+    'unpack (h, stride) bytes and shift them down to out_bits'
+    img = unpack(lines, width, fmt)
+    bits = RAW_FORMATS[fmt][0]
+    if out_bits is not None and out_bits < bits and fmt != 'raw16':
+        img >>= bits - out_bits
+    return img
+
+
+def read_raw(raw_path, width, height, fmt='raw16', stride=None, offset=0, frame=0, out_bits=None):
+    """
+    Read one frame of a RAW file through a memory map.
+
+    stride is the line pitch in bytes (defaults to the packed line size), offset the
+    header size in bytes and frame the frame index for files holding a sequence.
+    out_bits shifts the samples down to the bit depth the pipeline clips at (e.g. 10 for
+    the default 1023 clips), None keeps the sensor bit depth.
+    """
+    stride = check_stride(width, fmt, stride)
+    lines = np.memmap(raw_path, np.uint8, 'r', offset + frame * stride * height, (height, stride))
+    return unpack_frame(lines, width, fmt, out_bits)
+
+
+def decode_raw(buffer, width, height, fmt='raw16', stride=None, offset=0, out_bits=None):
+    'one frame from a bytes-like RAW buffer (e.g. a network payload), same layout as read_raw'
+    stride = check_stride(width, fmt, stride)
+    if len(buffer) < offset + stride * height:
+        raise ValueError(f'{len(buffer)} bytes hold no {width}x{height} {fmt} frame '
+                         f'({offset + stride * height} bytes needed)')
+    lines = np.frombuffer(buffer, np.uint8, stride * height, offset).reshape(height, stride)
+    return unpack_frame(lines, width, fmt, out_bits)
+
+
+def frame_count(raw_path, width, height, fmt='raw16', stride=None, offset=0):
+    'number of whole frames in a RAW file'
+    if stride is None:
+        stride = line_bytes(width, fmt)
+    return (os.path.getsize(raw_path) - offset) // (stride * height)
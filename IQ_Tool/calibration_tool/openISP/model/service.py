@@ -0,0 +1,315 @@
+#!/usr/bin/python
+import io
+import json
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from model import backend
+from model.config import ROWS
+from model.csc import yuv_to_rgb
+from model.pipeline import Pipeline, STAGE_ORDER, StageCache, as_matrix
+from model.rawio import decode_raw, read_raw
+
+OUTPUTS = ('yuv', 'rgb')
+
+# request fields that are not config parameters: name -> type
+REQUEST_FIELDS = OrderedDict([
+    ('path', str), ('width', int), ('height', int), ('format', str), ('stride', int),
+    ('offset', int), ('bits', int), ('output', str), ('preview', int), ('stages', str),
+])
+
+
+class Busy(Exception):
+    'raised by ISPService.submit when every worker and queue slot is taken'
+
+
+def typed_parameters(parameters):
+    'config overrides {name: value} typed and validated against model.config.SCHEMA'
+    typed = OrderedDict()
+    for name, value in parameters.items():
+        if name not in ROWS:
+            raise ValueError(f'unknown parameter {name!r}')
+        typed[name] = ROWS[name][0].convert(value, name)
+    return typed
+
+
+class ISPService:
+    """
+    Resident pipeline for many requests: the config is parsed, the kernels compiled and
+    the LUTs built once, then every request runs on a bounded thread pool (the NumPy and
+    Numba kernels release the GIL). Stage outputs are kept in one StageCache, so requests
+    re-running a frame with changed downstream parameters, as the GUIs do, resume after
+    the last unchanged stage. submit() raises Busy instead of queueing without bound.
+    """
+
+    def __init__(self, parameters, stages=STAGE_ORDER, workers=2, queue=4, cache_bytes=512 * 1024 * 1024):
+        self.parameters = OrderedDict(parameters)
+        self.stages = list(stages)
+        self.workers = workers
+        self.queue = queue
+        self.cache = StageCache(cache_bytes) if cache_bytes else None
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='isp')
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.processed = 0
+        self.failed = 0
+        self.active = 0
+
+    def warm(self, raw_w=64, raw_h=48):
+        'run a small frame through every stage, so JIT kernels are compiled before the first request'
+        rng = np.random.default_rng(0)
+        rawimg = rng.integers(64, 1000, (raw_h, raw_w)).astype(np.uint16)
+        start = time.perf_counter()
+        Pipeline(self.stages, self.parameters).execute(rawimg)
+        return time.perf_counter() - start
+
+    def set_parameters(self, parameters):
+        """
+        Update the resident config. The cache is kept: a stage key holds every parameter
+        the stage output depends on, including bayer_pattern for all RAW-domain stages,
+        so changed stages and everything downstream of them miss.
+        """
+        typed = typed_parameters(parameters)
+        with self.lock:
+            self.parameters.update(typed)
+        return typed
+
+    def process(self, rawimg, parameters=None, stages=None, output='yuv', preview=1):
+        """
+        Run one RAW frame, parameters overriding the resident config for this request
+        only. output 'rgb' converts a YUV result back with the inverse CSC; results of a
+        chain stopping before csc are returned as they are.
+        """
+        if output not in OUTPUTS:
+            raise ValueError(f'unknown output {output!r}, expected one of {OUTPUTS}')
+        with self.lock:
+            merged = dict(self.parameters)
+        merged.update(parameters or {})
+        stages = self.stages if stages is None else stages
+        pipeline = Pipeline(stages, merged, cache=self.cache, preview=preview)
+        img = pipeline.execute(rawimg)
+        if output == 'rgb' and 'csc' in [stage.name for stage in pipeline.stages]:
+            img = yuv_to_rgb(img, as_matrix(pipeline.parameters, 'csc_', 3, 4, 1024))
+        return img, pipeline.timings
+
+    def submit(self, rawimg, **kwargs):
+        'Future of process(rawimg, **kwargs) on the worker pool, Busy when it is full'
+        if not self.slots.acquire(blocking=False):
+            raise Busy(f'{self.workers} workers and {self.queue} queued requests busy')
+        try:
+            future = self.executor.submit(self.run, rawimg, kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        return future
+
+    def run(self, rawimg, kwargs):
+        with self.lock:
+            self.active += 1
+        try:
+            result = self.process(rawimg, **kwargs)
+        except Exception:
+            with self.lock:
+                self.failed += 1
+            raise
+        finally:
+            with self.lock:
+                self.active -= 1
+            self.slots.release()
+        with self.lock:
+            self.processed += 1
+        return result
+
+    def status(self):
+        with self.lock:
+            return {
+                'stages': self.stages,
+                'backend': backend.BACKEND,
+                'workers': self.workers,
+                'queue': self.queue,
+                'active': self.active,
+                'processed': self.processed,
+                'failed': self.failed,
+                'cache_bytes': self.cache.nbytes if self.cache is not None else 0,
+                'uptime': time.time() - self.started,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def parse_request(fields):
+    'split request fields into (typed request options, typed parameter overrides)'
+    options = {}
+    parameters = OrderedDict()
+    for name, value in fields.items():
+        if name in REQUEST_FIELDS:
+            options[name] = REQUEST_FIELDS[name](value)
+        else:
+            parameters[name] = value
+    if 'stages' in options:
+        options['stages'] = [stage for stage in options['stages'].split(',') if stage]
+    return options, typed_parameters(parameters)
+
+
+def load_frame(options, body=None):
+    'RAW image of a request: an .npy body, a raw buffer body, or a file path'
+    if body is not None and body[:6] == b'\x93NUMPY':
+        return np.load(io.BytesIO(body), allow_pickle=False)
+    for name in ('width', 'height'):
+        if name not in options:
+            raise ValueError(f'{name} is required for RAW buffers and files')
+    layout = (options['width'], options['height'], options.get('format', 'raw16'),
+              options.get('stride'), options.get('offset', 0))
+    out_bits = options.get('bits', 10)
+    if body is not None:
+        return decode_raw(body, *layout, out_bits=out_bits)
+    if 'path' not in options:
+        raise ValueError('no RAW data: send a RAW/.npy body or a path')
+    return np.array(read_raw(options['path'], *layout, out_bits=out_bits))
+
+
+class ISPRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of an ISPService (server.service):
+      GET  /status      JSON counters
+      POST /parameters  JSON {name: value}, updates the resident config
+      POST /process     RAW frame in, .npy image out. The frame is the request body (a
+                        RAW buffer laid out by the width/height/format/stride/offset/bits
+                        query fields, or an .npy array), or a JSON body {"path": ...,
+                        <the same fields>, "parameters": {...}}. Other query fields are
+                        parameter overrides; output=yuv|rgb, stages=dpc,blc,... and
+                        preview=N select what runs and what comes back.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, code, body, content_type='application/json', headers=()):
+        if content_type == 'application/json':
+            body = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/status':
+            self.reply(200, self.server.service.status())
+        else:
+            self.reply(404, {'error': f'no such endpoint {self.path}'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.body()
+        try:
+            if url.path == '/parameters':
+                self.reply(200, self.server.service.set_parameters(json.loads(body or b'{}')))
+            elif url.path == '/process':
+                self.process(dict(parse_qsl(url.query)), body)
+            else:
+                self.reply(404, {'error': f'no such endpoint {url.path}'})
+        except Busy as e:
+            self.reply(503, {'error': str(e)}, headers=[('Retry-After', '1')])
+        except (ValueError, KeyError, OSError) as e:
+            self.reply(400, {'error': str(e)})
+        except Exception as e:
+            self.reply(500, {'error': f'{type(e).__name__}: {e}'})
+
+    def process(self, fields, body):
+        if self.headers.get('Content-Type') == 'application/json':
+            request = json.loads(body)
+            fields.update({name: value for name, value in request.items() if name != 'parameters'})
+            fields.update(request.get('parameters', {}))
+            body = None
+        options, parameters = parse_request(fields)
+        rawimg = load_frame(options, body or None)
+        start = time.perf_counter()
+        future = self.server.service.submit(rawimg, parameters=parameters, stages=options.get('stages'),
+                                            output=options.get('output', 'yuv'),
+                                            preview=options.get('preview', 1))
+        img, timings = future.result()
+        out = io.BytesIO()
+        np.save(out, np.ascontiguousarray(img), allow_pickle=False)
+        self.reply(200, out.getvalue(), 'application/x-npy',
+                   [('X-ISP-Seconds', f'{time.perf_counter() - start:.6f}'),
+                    ('X-ISP-Timings', json.dumps(timings))])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(service, host='127.0.0.1', port=8765, verbose=False):
+    'HTTPServer answering ISPRequestHandler requests with service, not started yet'
+    server = ThreadingHTTPServer((host, port), ISPRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+class ISPClient:
+    """
+    Client of an isp_server.py daemon, for the GUIs and test scripts.
+
+        client = ISPClient('http://127.0.0.1:8765')
+        yuv = client.process(rawimg)                       # (H, W, 3) uint8
+        rgb = client.process('./raw/test.RAW', width=1920, height=1080, output='rgb')
+    """
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, path, data=None, content_type='application/json'):
+        headers = {'Content-Type': content_type} if data is not None else {}
+        try:
+            with urlopen(Request(self.url + path, data, headers), timeout=self.timeout) as response:
+                return response.read(), response.headers
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read())['error']
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f'ISP server: {e.code} {message}') from None
+
+    def status(self):
+        return json.loads(self.request('/status')[0])
+
+    def set_parameters(self, **parameters):
+        return json.loads(self.request('/parameters', json.dumps(parameters).encode())[0])
+
+    def process(self, raw, output='yuv', stages=None, parameters=None, **layout):
+        """
+        Processed image of raw: an ndarray, RAW bytes, or a path the server can read.
+        layout: width/height/format/stride/offset/bits of RAW bytes and paths.
+        """
+        fields = dict(layout, output=output)
+        if stages is not None:
+            fields['stages'] = ','.join(stages)
+        if isinstance(raw, str):
+            request = dict(fields, path=raw, parameters=parameters or {})
+            data, _ = self.request('/process', json.dumps(request).encode())
+        else:
+            fields.update(parameters or {})
+            if isinstance(raw, np.ndarray):
+                buffer = io.BytesIO()
+                np.save(buffer, raw, allow_pickle=False)
+                raw = buffer.getvalue()
+            data, _ = self.request('/process?' + urlencode(fields), raw, 'application/octet-stream')
+        return np.load(io.BytesIO(data), allow_pickle=False)
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+import itertools
+import queue
+import threading
+import time
+
+from model.preview import bin_bayer
+from model.rawio import frame_count, read_raw
+
+# sentinel closing a queue once the last frame went through
+END = object()
+
+
+class Failure:
+    'exception raised by a worker, forwarded downstream and re-raised to the consumer'
+
+    def __init__(self, error):
+        self.error = error
+
+
+def raw_frames(raw_path, width, height, fmt='raw16', stride=None, offset=0, out_bits=None):
+    'frames of a concatenated RAW sequence (burst/video dump), each read through the memory map'
+    for frame in range(frame_count(raw_path, width, height, fmt, stride, offset)):
+        yield read_raw(raw_path, width, height, fmt, stride, offset, frame, out_bits)
+
+
+def domain(stage):
+    'RAW for the Bayer-plane stages, YUV for the y/uv ones, RGB for the rest (CFA onward)'
+    if stage.plane == 'bayer':
+        return 'raw'
+    if stage.plane in ('y', 'uv'):
+        return 'yuv'
+    return 'rgb'
+
+
+def stage_groups(stages):
+    'consecutive stages of the same domain (RAW / RGB / YUV), one worker thread each'
+    groups = []
+    for stage in stages:
+        if groups and domain(groups[-1][-1]) == domain(stage):
+            groups[-1].append(stage)
+        else:
+            groups.append([stage])
+    return groups
+
+
+class StreamPipeline:
+    """
+    Multi-frame execution of a Pipeline: each stage group runs in its own thread and
+    hands frames to the next group through a bounded queue, so RAW stages of frame N+2
+    overlap RGB stages (CFA onward) of frame N+1 and YUV stages of frame N. The NumPy kernels release
+    the GIL, which is what lets the groups run in parallel.
+
+    Output comes out in input order (every group is a single FIFO worker). A full queue
+    blocks its producer, so at most depth frames wait between two groups and a slow
+    consumer throttles the reader (backpressure).
+    """
+
+    def __init__(self, pipeline, depth=2):
+        if pipeline.pool is not None or pipeline.cache is not None:
+            raise ValueError('frames in flight cannot share pooled or cached stage outputs')
+        if pipeline.stripe_rows or pipeline.profiler:
+            raise ValueError('streaming runs whole frames without the profiler')
+        self.pipeline = pipeline
+        self.depth = depth
+        self.groups = stage_groups(pipeline.stages)
+        self.spans = []     # (group index, frame index, start, end) of every group run, last process() call
+
+    def put(self, q, item, stop):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return END
+
+    def feed(self, frames, q, stop):
+        try:
+            for rawimg in frames:
+                if not self.put(q, {'img': bin_bayer(rawimg, self.pipeline.preview)}, stop):
+                    return
+        except BaseException as e:
+            self.put(q, Failure(e), stop)
+            return
+        self.put(q, END, stop)
+
+    def work(self, index, src, dst, stop):
+        group = self.groups[index]
+        for frame in itertools.count():
+            item = self.get(src, stop)
+            if item is not END and not isinstance(item, Failure):
+                start = time.perf_counter()
+                try:
+                    for stage in group:
+                        self.pipeline.run_stage(item, stage)
+                except BaseException as e:
+                    item = Failure(e)
+                # frames pass every group in order, the k-th one a group runs is frame k
+                self.spans.append((index, frame, start, time.perf_counter()))
+            if not self.put(dst, item, stop) or item is END or isinstance(item, Failure):
+                return
+
+    def process(self, frames):
+        'generator of pipeline outputs for an iterable of RAW frames, in the same order'
+        stop = threading.Event()
+        self.spans = []
+        queues = [queue.Queue(self.depth) for _ in range(len(self.groups) + 1)]
+        threads = [threading.Thread(target=self.feed, args=(frames, queues[0], stop), daemon=True)]
+        for k in range(len(self.groups)):
+            threads.append(threading.Thread(target=self.work, args=(k, queues[k], queues[k + 1], stop),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is END:
+                    return
+                if isinstance(item, Failure):
+                    raise item.error
+                yield self.pipeline.output(item)
+        finally:
+            # also reached when the consumer stops early: unblock and join the workers
+            stop.set()
+            for thread in threads:
+                thread.join()
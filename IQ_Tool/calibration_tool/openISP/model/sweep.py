@@ -0,0 +1,158 @@
+#!/usr/bin/python
+import itertools
+import os
+import time
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from model.metrics import METRICS, REFERENCE_METRICS
+from model.pipeline import DEFAULT_PARAMETERS, Pipeline, STAGE_ORDER
+
+
+def grid(variations):
+    'every combination of {name: [values]}, as a list of {name: value} points'
+    names = list(variations)
+    return [dict(zip(names, values)) for values in itertools.product(*(variations[name] for name in names))]
+
+
+class Node:
+    'run of stages between two branch points of the sweep tree, computed once for all points below it'
+
+    def __init__(self, stages, parameters):
+        self.stages = stages            # stage names run on the parent output
+        self.parameters = parameters    # parameters of any point below, they agree on these stages
+        self.children = OrderedDict()   # Stage.key chain -> Node
+        self.points = []                # sweep points whose chain ends here
+
+    def compress(self):
+        'merge single-child chains, so every node ends at a branch point or a leaf'
+        while len(self.children) == 1 and not self.points:
+            child = next(iter(self.children.values()))
+            self.stages = self.stages + child.stages
+            self.parameters = child.parameters
+            self.children = child.children
+            self.points = child.points
+        for child in self.children.values():
+            child.compress()
+
+    def nodes(self):
+        yield self
+        for child in self.children.values():
+            yield from child.nodes()
+
+
+# set once per worker process by init_worker
+worker_metrics = None
+worker_reference = None
+
+
+def init_worker(metrics, reference):
+    global worker_metrics, worker_reference
+    worker_metrics = metrics
+    worker_reference = reference
+
+
+def run_segment(frame, stages, parameters, keep_frame, score, out_path=None):
+    'run a node: its stages on the parent frame, then the frame for the children and/or the leaf scores'
+    start = time.perf_counter()
+    pipeline = Pipeline(stages, parameters)
+    for stage in pipeline.stages:
+        pipeline.run_stage(frame, stage)
+    scores = None
+    if score:
+        img = pipeline.output(dict(frame))
+        scores = {name: metric(img, worker_reference) for name, metric in worker_metrics.items()}
+        if out_path:
+            np.save(out_path, img)
+    return (frame if keep_frame else None), scores, time.perf_counter() - start
+
+
+class Sweep:
+    """
+    Runs one RAW frame through the pipeline for many parameter points. The points are
+    arranged in a prefix tree of Stage.key chains (the StageCache keys), so a stage whose
+    parameters and upstream are shared by several points runs once for all of them. Each
+    node is a task on a process pool, submitted as soon as its parent output is ready;
+    leaves score the output with the metrics, in the workers.
+    """
+
+    def __init__(self, parameters, stages=STAGE_ORDER, metrics=('noise_std',), jobs=None, out_dir=None):
+        self.parameters = dict(DEFAULT_PARAMETERS)
+        self.parameters.update(parameters)
+        self.stages = list(stages)
+        # names from METRICS or {name: metric(img, reference)} for custom ones
+        self.metrics = metrics if isinstance(metrics, dict) else OrderedDict((m, METRICS[m]) for m in metrics)
+        self.jobs = jobs
+        self.out_dir = out_dir
+        self.stats = {}
+
+    def tree(self, points):
+        root = Node([], self.parameters)
+        for index, point in enumerate(points):
+            pipeline = Pipeline(self.stages, dict(self.parameters, **point))
+            node = root
+            key = b''
+            for stage in pipeline.stages:
+                key = stage.key(key, pipeline.parameters)
+                if key not in node.children:
+                    node.children[key] = Node([stage.name], pipeline.parameters)
+                node = node.children[key]
+            node.points.append(index)
+        for child in root.children.values():
+            child.compress()
+        return root
+
+    def reference(self, rawimg):
+        'output of the base parameters, what reference metrics compare against by default'
+        return Pipeline(self.stages, self.parameters).execute(rawimg)
+
+    def run(self, rawimg, points, reference=None):
+        """
+        One result per point, in order: {'index', 'parameters' (the point), 'scores', 'output'}.
+        self.stats compares the stage runs done with the points x stages of separate runs.
+        """
+        start = time.perf_counter()
+        if reference is None and any(name in REFERENCE_METRICS for name in self.metrics):
+            reference = self.reference(rawimg)
+        root = self.tree(points)
+        nodes = [node for child in root.children.values() for node in child.nodes()]
+        results = [{'index': index, 'parameters': point, 'scores': None, 'output': None}
+                   for index, point in enumerate(points)]
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+
+        busy = 0
+        with ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=(self.metrics, reference)) as pool:
+            pending = {}
+
+            def submit(node, frame):
+                out_path = os.path.join(self.out_dir, f'{node.points[0]:04d}.npy') if self.out_dir and node.points else None
+                future = pool.submit(run_segment, frame, node.stages, node.parameters,
+                                     bool(node.children), bool(node.points), out_path)
+                pending[future] = (node, out_path)
+
+            for child in root.children.values():
+                submit(child, {'img': rawimg})
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, out_path = pending.pop(future)
+                    frame, scores, seconds = future.result()
+                    busy += seconds
+                    for index in node.points:
+                        results[index]['scores'] = scores
+                        results[index]['output'] = out_path
+                    for child in node.children.values():
+                        submit(child, frame)
+
+        self.stats = {
+            'points': len(points),
+            'leaves': sum(1 for node in nodes if node.points),
+            'tasks': len(nodes),
+            'stage_runs': sum(len(node.stages) for node in nodes),
+            'naive_stage_runs': len(points) * len(self.stages),
+            'worker_seconds': busy,
+            'wall_seconds': time.perf_counter() - start,
+        }
+        return results
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backend equivalence test
+Runs DPC (both modes), CNF and EE with every installed kernel backend of model.backend
+on the same synthetic frames and asserts the outputs are identical to the NumPy ones,
+then does the same for the whole pipeline. Exits with code 1 on a mismatch.
+
+usage: python test_backends.py
+"""
+
+import sys
+import numpy as np
+
+from benchmark_isp import synthetic_bayer
+from model import backend
+from model.cnf import CNF
+from model.dpc import DPC
+from model.eeh import EE
+from model.pipeline import Pipeline, STAGE_ORDER, load_parameters
+
+
+def stage_outputs(parameters):
+    'output of every kernel-backed stage, run with the current backend'
+    rng = np.random.default_rng(0)
+    outputs = {}
+    for bayer_pattern in ('rggb', 'gbrg'):
+        rawimg = synthetic_bayer(320, 240, bayer_pattern, 1)
+        for mode in ('gradient', 'mean'):
+            outputs[('dpc', bayer_pattern, mode)] = DPC(rawimg, 20, mode, 1023).execute()
+        # strong chroma blobs so the CNF fade ladders are reached
+        noisy = rawimg.copy()
+        noisy[0::2, 0::2] += 120
+        noisy[rng.random(noisy.shape) < 0.2] += 200
+        gain = [1.5, 1.0, 1.0, 1.1]
+        outputs[('cnf', bayer_pattern)] = CNF(noisy, bayer_pattern, 0, gain, 1023).execute()
+    y = rng.integers(0, 256, (240, 320)).astype(np.int16)
+    edge_filter = np.array([[-1, 0, -1, 0, -1], [-1, 0, 8, 0, -1], [-1, 0, -1, 0, -1]])
+    ee_img, em_img = EE(y, edge_filter, [32, 128], [32, 64], [-64, 64]).execute()
+    outputs[('ee',)] = ee_img
+    outputs[('edgemap',)] = em_img
+    outputs[('pipeline',)] = Pipeline(STAGE_ORDER, parameters).execute(synthetic_bayer(320, 240))
+    return outputs
+
+
+def main():
+    parameters = load_parameters('./config/config.csv')
+    selected = backend.BACKEND
+    try:
+        backend.set_backend('numpy')
+        reference = stage_outputs(parameters)
+        failures = []
+        for name in backend.available_backends():
+            backend.set_backend(name)
+            for key, out in stage_outputs(parameters).items():
+                ok = out.dtype == reference[key].dtype and np.array_equal(out, reference[key])
+                print(f'{name:<6} {"/".join(key):<20} {"ok" if ok else "MISMATCH"}')
+                if not ok:
+                    failures.append(f'{name}: {"/".join(key)}')
+    finally:
+        backend.set_backend(selected)
+    missing = [name for name in backend.BACKENDS if name not in backend.available_backends()]
+    if missing:
+        print(f'not installed, not tested: {", ".join(missing)}')
+    if failures:
+        print(f'{len(failures)} output(s) differ from the numpy backend: ' + ', '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
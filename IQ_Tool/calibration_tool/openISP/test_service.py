@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ISP daemon test
+Starts model.service on a free localhost port and checks through ISPClient that RAW
+buffers, .npy arrays and file paths come back identical to a direct Pipeline.execute,
+with per-request and resident parameter changes, RGB output, and 400/503 errors.
+Exits with code 1 on a failure.
+
+usage: python test_service.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmark_isp import synthetic_bayer
+from model.csc import yuv_to_rgb
+from model.pipeline import Pipeline, STAGE_ORDER, as_matrix, load_parameters
+from model.service import Busy, ISPClient, ISPService, serve
+
+
+def main():
+    parameters = load_parameters('./config/config.csv')
+    service = ISPService(parameters, workers=1, queue=1)
+    print(f'warm up: {service.warm():.3f} s')
+    server = serve(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = ISPClient('http://127.0.0.1:%d' % server.server_address[1])
+    rawimg = synthetic_bayer(320, 240)
+    failures = []
+
+    def check(name, out, expected):
+        ok = out.dtype == expected.dtype and np.array_equal(out, expected)
+        print(f'{name:<24} {"ok" if ok else "MISMATCH"}')
+        if not ok:
+            failures.append(name)
+
+    def direct(**overrides):
+        return Pipeline(STAGE_ORDER, dict(parameters, **overrides)).execute(rawimg)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, 'frame.raw')
+        rawimg.astype('<u2').tofile(raw_path)
+        layout = dict(width=320, height=240)
+        start = time.perf_counter()
+        check('npy body', client.process(rawimg), direct())
+        first = time.perf_counter() - start
+        check('raw buffer', client.process(rawimg.astype('<u2').tobytes(), **layout), direct())
+        check('path', client.process(raw_path, **layout), direct())
+        start = time.perf_counter()
+        check('override nlm_h', client.process(rawimg, parameters={'nlm_h': 4}), direct(nlm_h=4))
+        resumed = time.perf_counter() - start
+        check('override in path', client.process(raw_path, parameters={'ee_gain_max': 64}, **layout),
+              direct(ee_gain_max=64))
+        check('rgb', client.process(rawimg, output='rgb'),
+              yuv_to_rgb(direct(), as_matrix(parameters, 'csc_', 3, 4, 1024)))
+        check('raw stages', client.process(rawimg, stages=['dpc', 'blc']),
+              Pipeline(['dpc', 'blc'], parameters).execute(rawimg))
+        client.set_parameters(dpc_thres=60)
+        check('resident dpc_thres', client.process(rawimg), direct(dpc_thres=60))
+        # RAW-domain stages cached under rggb must not serve another pattern
+        check('override bayer_pattern', client.process(rawimg, parameters={'bayer_pattern': 'gbrg'}),
+              direct(dpc_thres=60, bayer_pattern='gbrg'))
+        client.set_parameters(bayer_pattern='bggr')
+        check('resident bayer_pattern', client.process(rawimg), direct(dpc_thres=60, bayer_pattern='bggr'))
+        print(f'first frame {first:.3f} s, nlm change resumed from cache {resumed:.3f} s')
+
+    for name, call in [('unknown parameter', lambda: client.process(rawimg, parameters={'bogus': 1})),
+                       ('bad value', lambda: client.set_parameters(dpc_thres='x')),
+                       ('short buffer', lambda: client.process(b'\0' * 10, width=320, height=240))]:
+        try:
+            call()
+            failures.append(name)
+            print(f'{name:<24} NOT REJECTED')
+        except RuntimeError as e:
+            print(f'{name:<24} ok ({e})')
+
+    # one worker and one queue slot: the third concurrent request must be turned away
+    gate = threading.Event()
+    service.executor.submit(gate.wait)
+    held = [service.submit(rawimg) for _ in range(2)]
+    try:
+        service.submit(rawimg)
+        failures.append('busy')
+    except Busy as e:
+        print(f'{"busy":<24} ok ({e})')
+    gate.set()
+    for future in held:
+        future.result()
+    print(client.status())
+    server.shutdown()
+    service.shutdown()
+    if failures:
+        print(f'{len(failures)} check(s) failed: ' + ', '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
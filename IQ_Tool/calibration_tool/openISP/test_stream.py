@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming pipeline test
+Runs a burst of synthetic frames through model.stream.StreamPipeline and asserts the
+outputs are identical to sequential Pipeline.execute runs, that CFA starts the RGB
+group, and that the RAW stages of frame N+1 ran while the CFA group worked on frame N.
+Prints the time every group was busy. Exits with code 1 on a failure.
+
+usage: python test_stream.py
+"""
+
+import sys
+import time
+import numpy as np
+
+from benchmark_isp import synthetic_bayer
+from model.pipeline import Pipeline, STAGE_ORDER, load_parameters
+from model.stream import StreamPipeline
+
+
+def main():
+    parameters = load_parameters('./config/config.csv')
+    frames = [synthetic_bayer(640, 480, 'rggb', seed) for seed in range(6)]
+    failures = []
+
+    start = time.perf_counter()
+    expected = [Pipeline(STAGE_ORDER, parameters).execute(rawimg) for rawimg in frames]
+    sequential = time.perf_counter() - start
+
+    stream = StreamPipeline(Pipeline(STAGE_ORDER, parameters))
+    names = [[stage.name for stage in group] for group in stream.groups]
+    print('stage groups: ' + ' | '.join(' '.join(group) for group in names))
+    start = time.perf_counter()
+    outputs = list(stream.process(iter(frames)))
+    streamed = time.perf_counter() - start
+    if len(outputs) != len(frames) or not all(np.array_equal(a, b) for a, b in zip(outputs, expected)):
+        failures.append('outputs')
+
+    raw_group = next(k for k, group in enumerate(names) if 'dpc' in group)
+    cfa_group = next(k for k, group in enumerate(names) if 'cfa' in group)
+    if cfa_group == raw_group or names[cfa_group][0] != 'cfa':
+        failures.append('cfa group')
+    spans = {(group, frame): (begin, end) for group, frame, begin, end in stream.spans}
+    overlaps = [frame for frame in range(len(frames) - 1)
+                if spans[raw_group, frame + 1][0] < spans[cfa_group, frame][1]
+                and spans[cfa_group, frame][0] < spans[raw_group, frame + 1][1]]
+    print(f'RAW of frame N+1 overlapping CFA of frame N for N in {overlaps}')
+    if not overlaps:
+        failures.append('overlap')
+
+    for k, group in enumerate(names):
+        busy = sum(end - begin for index, _, begin, end in stream.spans if index == k)
+        print(f'{" ".join(group):<24} busy {busy:.3f} s')
+    print(f'{len(frames)} frames: streamed {streamed:.3f} s, sequential {sequential:.3f} s')
+    if failures:
+        print(f'{len(failures)} check(s) failed: ' + ', '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
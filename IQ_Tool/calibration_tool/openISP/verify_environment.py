@@ -41,6 +41,7 @@ def check_environment():
         'PyQt5': 'PyQt5 (可選 - 高級GUI)',
         'cv2': 'OpenCV (可選)',
         'matplotlib': 'Matplotlib (可選)',
+        'numba': 'Numba (可選 - JIT 加速核心)',
     }
     
     print("\n可選模塊檢查:")